@@ -1,24 +1,45 @@
+from __future__ import annotations
+
 import sys
-from typing import Optional
+import threading
+from functools import lru_cache
+from typing import Optional, TYPE_CHECKING
 
 import loguru
 
-from src.service.config_manager import ConfigManager
 from src.service_factory import ServiceFactory, ServiceFactoryConfig
 
-config_manager = ConfigManager()
+if TYPE_CHECKING:
+    from src.model import LLMConfig
+    from src.service.config_manager import ConfigManager
+    from src.settings import LanguageLearningMethodSettings
+
+_settings: Optional[LanguageLearningMethodSettings] = None
+_prefetch_thread: Optional[threading.Thread] = None
+
+
+@lru_cache(maxsize=1)
+def get_config_manager() -> ConfigManager:
+    # imported here so that e.g. `--help` doesn't load pydantic-settings
+    from src.service.config_manager import ConfigManager
+
+    return ConfigManager()
 
-settings_ = config_manager.read_settings()
-loguru.logger.remove()
-loguru.logger.add(
-    sys.stdout,
-    level=settings_.logger_level,
-)
 
+def _get_settings() -> LanguageLearningMethodSettings:
+    """Settings parsed once per process and re-read only after they were written."""
+    global _settings
+    config_manager = get_config_manager()
+    if _settings is None or config_manager.dirty:
+        _settings = config_manager.read_settings()
+        _persistence_factory.cache_clear()
+        _llm_factory.cache_clear()
+        config_manager.dirty = False
+    return _settings
 
-def get_service_factory(llm_name: Optional[str]) -> ServiceFactory:
-    settings = config_manager.read_settings()
 
+def _resolve_llm_config(llm_name: Optional[str]) -> LLMConfig:
+    settings = _get_settings()
     if llm_name:
         llm_config = settings.llms_config.get(llm_name)
     else:
@@ -26,8 +47,63 @@ def get_service_factory(llm_name: Optional[str]) -> ServiceFactory:
 
     if not llm_config:
         raise ValueError(f"LLM with name {llm_name} not found")
+    return llm_config
+
+
+def configure_logging() -> None:
+    settings = _get_settings()
+    loguru.logger.remove()
+    loguru.logger.add(
+        sys.stdout,
+        level=settings.logger_level,
+    )
+
+
+@lru_cache(maxsize=1)
+def _persistence_factory() -> ServiceFactory:
+    settings = _get_settings()
+    return ServiceFactory(ServiceFactoryConfig(data_dir=settings.data_dir))
 
-    service_factory = ServiceFactory(
+
+@lru_cache(maxsize=4)
+def _llm_factory(llm_name: Optional[str]) -> ServiceFactory:
+    llm_config = _resolve_llm_config(llm_name)
+    settings = _get_settings()
+    return ServiceFactory(
         ServiceFactoryConfig(llm_config=llm_config, data_dir=settings.data_dir)
     )
-    return service_factory
+
+
+def prefetch_persistence_service() -> None:
+    """Build the persistence service in a background thread."""
+    global _prefetch_thread
+    _prefetch_thread = threading.Thread(
+        target=lambda: _cached_persistence_factory().persistence_service,
+        daemon=True,
+    )
+    _prefetch_thread.start()
+
+
+def _cached_persistence_factory() -> ServiceFactory:
+    _get_settings()
+    return _persistence_factory()
+
+
+def get_persistence_factory() -> ServiceFactory:
+    """Service factory for commands that don't talk to an LLM."""
+    # settings and factories are cached without locks, so wait for the prefetch
+    # instead of building them concurrently with it
+    if _prefetch_thread is not None:
+        _prefetch_thread.join()
+    return _cached_persistence_factory()
+
+
+def get_llm_factory(llm_name: Optional[str]) -> ServiceFactory:
+    """
+    Service factory bound to the given LLM (or the default one). Factories are
+    reused within the process until the settings are written again.
+    """
+    if _prefetch_thread is not None:
+        _prefetch_thread.join()
+    _get_settings()
+    return _llm_factory(llm_name)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+from typer import Argument
+
+from src.app import get_llm_factory, get_persistence_factory
+
+if TYPE_CHECKING:
+    from src.service.exercise_builder_service import ExerciseBuilderService
+    from src.service.exercise_extraction_service import ExerciseExtractionService
+
+
+def extract_exercises(
+    book_name: str = Argument(..., help="The name of the textbook"),
+    start_page: int = Argument(..., help="The starting page number"),
+    end_page: int = Argument(..., help="The ending page number"),
+    llm_name: Optional[str] = Argument(
+        None, help="The name of the LLM to use, if not given the default LLM is used"
+    ),
+) -> None:
+    """
+    Extracts exercises from a parsed textbook using the LLM.
+    """
+    service_factory = get_llm_factory(llm_name)
+    exercise_extraction_service: ExerciseExtractionService = (
+        service_factory.exercise_extractor_service
+    )
+    exercise_extraction_service.extract_exercises(
+        book_name=book_name, start_page=start_page, end_page=end_page
+    )
+
+
+def get_exercises_prompts(
+    book_name: str = Argument(..., help="The name of the textbook"),
+    start_page: int = Argument(..., help="The starting page number"),
+    end_page: int = Argument(..., help="The ending page number"),
+    out_dir: Path = Argument(Path("."), help="The directory to save the exercises"),
+    llm_name: Optional[str] = Argument(
+        None, help="The name of the LLM to use, if not given the default LLM is used"
+    ),
+) -> None:
+    """
+    Get all the prompts of the exercises
+    """
+    service_factory = get_persistence_factory()
+    exercise_builder_service: ExerciseBuilderService = (
+        service_factory.exercise_builder_service
+    )
+    exercise_builder_service.build_exercise_prompts(
+        book_name, out_dir, start_page, end_page
+    )
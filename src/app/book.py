@@ -1,15 +1,42 @@
+from __future__ import annotations
+
 import json
+import os
+import sys
 from pathlib import Path
-from typing import Optional
+from typing import Optional, TYPE_CHECKING, Iterable, Iterator, Callable
 
 import typer
 from typer import Typer, Argument, Option
 
-from src.app import get_service_factory
+from src.app import get_persistence_factory, prefetch_persistence_service
+from src.app._commands import extract_exercises, get_exercises_prompts
 from src.enums import OutputFormat
-from src.service.persitence_service import PersistenceService
+
+if TYPE_CHECKING:
+    from src.service.persitence_service import PersistenceService, ParsedPage
 
 app = Typer()
+app.command()(extract_exercises)
+app.command()(get_exercises_prompts)
+
+# commands which prompt the user before they need their services
+_PREFETCH_COMMANDS = {"add"}
+
+
+@app.callback()
+def prefetch_services(ctx: typer.Context) -> None:
+    """
+    Runs before the subcommand parses its options, so for prompting commands the
+    services are built in the background while the user is typing.
+    Set LLM_PREFETCH=0 to disable.
+    """
+    if ctx.invoked_subcommand not in _PREFETCH_COMMANDS:
+        return
+    if os.environ.get("LLM_PREFETCH", "1") == "0":
+        return
+
+    prefetch_persistence_service()
 
 
 @app.command()
@@ -31,69 +58,21 @@ def add(
     if not book_name:
         raise ValueError("Book name is required")
 
-    service_factory = get_service_factory(None)
-    persistence_service: PersistenceService = service_factory.persistence_service()
+    service_factory = get_persistence_factory()
+    persistence_service: PersistenceService = service_factory.persistence_service
 
     persistence_service.add_book(book_path, book_name)
     typer.echo(f"✅ {book_name} added successfully")
 
 
-@app.command()
-def extract_exercises(
-    book_name: str = Argument(..., help="The name of the textbook"),
-    start_page: int = Argument(..., help="The starting page number"),
-    end_page: int = Argument(..., help="The ending page number"),
-    llm_name: Optional[str] = Argument(
-        None, help="The name of the LLM to use, if not given the default LLM is used"
-    ),
-) -> None:
-    """
-    Extracts exercises from a parsed textbook using the LLM.
-    """
-    from src.service.exercise_extraction_service import ExerciseExtractionService
-
-    service_factory = get_service_factory(llm_name)
-    exercise_extraction_service: ExerciseExtractionService = (
-        service_factory.exercise_extractor_service()
-    )
-    exercise_extraction_service.extract_exercises(
-        book_name=book_name, start_page=start_page, end_page=end_page
-    )
-
-
-@app.command()
-def get_exercises_prompts(
-    book_name: str = Argument(..., help="The name of the textbook"),
-    start_page: int = Argument(..., help="The starting page number"),
-    end_page: int = Argument(..., help="The ending page number"),
-    out_dir: Path = Argument(Path("."), help="The directory to save the exercises"),
-    llm_name: Optional[str] = Argument(
-        None, help="The name of the LLM to use, if not given the default LLM is used"
-    ),
-) -> None:
-    """
-    Get all the prompts of the exercises
-    """
-    from src.service.exercise_builder_service import ExerciseBuilderService
-
-    service_factory = get_service_factory(llm_name)
-    exercise_builder_service: ExerciseBuilderService = (
-        service_factory.exercise_builder_service()
-    )
-    exercise_builder_service.build_exercise_prompts(
-        book_name, out_dir, start_page, end_page
-    )
-
-
 @app.command()
 def list_all() -> None:
     """
     List all available books
     """
-    service_factory = get_service_factory(None)
-    persistence_service: PersistenceService = service_factory.persistence_service()
-    books = sorted(persistence_service.list_book_names())
-    for book_name in books:
+    service_factory = get_persistence_factory()
+    persistence_service: PersistenceService = service_factory.persistence_service
+    for book_name in persistence_service.iter_book_names():
         typer.echo(book_name)
 
 
@@ -104,15 +83,52 @@ def describe(
     """
     Describe a book
     """
-    service_factory = get_service_factory(None)
-    persistence_service: PersistenceService = service_factory.persistence_service()
-    book_ = persistence_service.get_book(book_name)
-    if not book_:
-        raise ValueError(f"Book with name {book_} not found")
+    service_factory = get_persistence_factory()
+    persistence_service: PersistenceService = service_factory.persistence_service
+    if not persistence_service.book_exists(book_name):
+        raise ValueError(f"Book with name {book_name} not found")
+
+    typer.echo(f"Name: {book_name}")
+    typer.echo(f"Pages: {persistence_service.count_parsed_pages(book_name)}")
+
+
+def _json_stream(pages: Iterable[ParsedPage]) -> Iterator[str]:
+    encoder = json.JSONEncoder()
+    yield "["
+    for i, page in enumerate(pages):
+        if i:
+            yield ", "
+        yield from encoder.iterencode(page.to_stdout_dict())
+    yield "]\n"
+
+
+def _md_stream(pages: Iterable[ParsedPage]) -> Iterator[str]:
+    for page in pages:
+        yield f"== Page {page.page_number}\n"
+        yield f"{page.content}\n"
+        yield "\n" + "-" * 80 + "\n\n"
+
 
-    parsed_pages = persistence_service.get_all_parsed_pages(book_name)
-    typer.echo(f"Name: {book_.name}")
-    typer.echo(f"Pages: {len(parsed_pages)}")
+_FORMATTERS: dict[OutputFormat, Callable[[Iterable[ParsedPage]], Iterator[str]]] = {
+    OutputFormat.json: _json_stream,
+    OutputFormat.md: _md_stream,
+}
+
+
+_WRITE_BUFFER_SIZE = 64 * 1024
+
+
+def _write_buffered(chunks: Iterable[str]) -> None:
+    """Write output chunks to a redirected stdout in large encoded blocks"""
+    write = sys.stdout.buffer.write
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk.encode("utf-8")
+        if len(buffer) >= _WRITE_BUFFER_SIZE:
+            write(buffer)
+            buffer.clear()
+    write(buffer)
+    sys.stdout.buffer.flush()
 
 
 @app.command()
@@ -128,63 +144,70 @@ def show_pages(
     E.g. Show pages from 10 to 20 of a `life-vision` book:
     > show-pages "life-vision" --offset 10 --limit 20 --format md
     """
-    service_factory = get_service_factory(None)
-    persistence_service: PersistenceService = service_factory.persistence_service()
-    book = persistence_service.get_book(book_name)
-    if not book:
+    if format not in _FORMATTERS:
+        raise NotImplementedError(f"Output format {format} not implemented")
+
+    service_factory = get_persistence_factory()
+    persistence_service: PersistenceService = service_factory.persistence_service
+    if not persistence_service.book_exists(book_name):
         raise ValueError(f"Book with name {book_name} not found")
 
-    book_pages = persistence_service.get_all_parsed_pages(book_name)
-    if len(book_pages) <= 0:
+    pages_count = persistence_service.count_parsed_pages(book_name)
+    if pages_count <= 0:
         typer.echo("No parsed pages found", err=True)
         return
 
     if number_of_pages < 1:
         raise ValueError("Number of pages must be greater than 0")
 
-    if start_page_num <= 0 or start_page_num > len(book_pages):
+    if start_page_num <= 0 or start_page_num > pages_count:
         raise ValueError(f"Invalid start page number {start_page_num}")
 
-    if len(book_pages) < start_page_num + number_of_pages:
-        number_of_pages = len(book_pages) - start_page_num
+    if pages_count < start_page_num + number_of_pages:
+        number_of_pages = pages_count - start_page_num
 
-    book_pages.sort(key=lambda page: page.page_number)
-    pages = book_pages[start_page_num - 1 : start_page_num + number_of_pages - 1]
-    if format == OutputFormat.json:
-        typer.echo(
-            json.dumps(
-                [page.to_stdout_dict() for page in pages],
-            )
-        )
-    elif format == OutputFormat.md:
-        for page in pages:
-            typer.echo(f"== Page {page.page_number}")
-            typer.echo(page.content)
-            typer.echo("\n" + "-" * 80 + "\n")
+    pages = persistence_service.iter_parsed_pages(
+        book_name, offset=start_page_num - 1, limit=number_of_pages
+    )
+    chunks = _FORMATTERS[format](pages)
+    if sys.stdout.isatty():
+        for chunk in chunks:
+            typer.echo(chunk, nl=False)
     else:
-        raise NotImplementedError(f"Output format {format} not implemented")
+        _write_buffered(chunks)
 
 
 @app.command()
 def clear_pages(
     book_name: str = Argument(..., help="The name of the book"),
+    yes: bool = Option(
+        False, "--yes", "-y", help="Delete extracted exercises without asking"
+    ),
 ) -> None:
     """
-    Delete all parsed pages of a book
+    Delete all parsed pages of a book, together with the exercises extracted from them
     """
-    service_factory = get_service_factory(None)
-    persistence_service: PersistenceService = service_factory.persistence_service()
-    book = persistence_service.get_book(book_name)
-    if not book:
+    service_factory = get_persistence_factory()
+    persistence_service: PersistenceService = service_factory.persistence_service
+    if not persistence_service.book_exists(book_name):
         raise ValueError(f"Book with name {book_name} not found")
 
-    book_pages = persistence_service.get_all_parsed_pages(book_name)
-    if len(book_pages) == 0:
+    if persistence_service.count_parsed_pages(book_name) == 0:
         typer.echo(f"No parsed pages found for {book_name}")
         return
 
+    exercises_count = persistence_service.count_exercises(book_name)
+    if exercises_count and not yes:
+        typer.confirm(
+            f"This also deletes {exercises_count} exercises extracted from "
+            f"{book_name}. Continue?",
+            abort=True,
+        )
+
     persistence_service.clear_book_pages(book_name)
     typer.echo(f"✅ parsed pages of {book_name} deleted successfully")
+    if exercises_count:
+        typer.echo(f"✅ {exercises_count} extracted exercises deleted with them")
 
 
 @app.command()
@@ -194,7 +217,7 @@ def delete(
     """
     Delete a book and all connected data
     """
-    service_factory = get_service_factory(None)
-    persistence_service: PersistenceService = service_factory.persistence_service()
+    service_factory = get_persistence_factory()
+    persistence_service: PersistenceService = service_factory.persistence_service
     persistence_service.delete_book_and_connected_data(book_name)
     typer.echo(f"✅ {book_name} deleted successfully")
@@ -3,7 +3,7 @@ from pathlib import Path
 
 import typer
 
-from src.app import config_manager
+from src.app import get_config_manager
 
 app = typer.Typer()
 
@@ -25,8 +25,9 @@ def add_llm(
     """
     Add a new LLM configuration which then can be used in other commands.
     """
-    from src.service.llm_service import LLMConfig
+    from src.model import LLMConfig
 
+    config_manager = get_config_manager()
     settings = config_manager.read_settings()
     if llm_name in settings.llms_config:
         typer.echo(f"LLM with name {llm_name} already exists", err=True)
@@ -47,6 +48,7 @@ def remove_llm(
     """
     Remove an LLM configuration.
     """
+    config_manager = get_config_manager()
     settings = config_manager.read_settings()
     if llm_name not in settings.llms_config:
         typer.echo(f"LLM with name {llm_name} does not exist", err=True)
@@ -66,13 +68,13 @@ def set_default_llm(
     """
     Set an LLM as the default LLM.
     """
+    config_manager = get_config_manager()
     settings = config_manager.read_settings()
     if llm_name not in settings.llms_config:
         typer.echo(f"LLM with name {llm_name} does not exist", err=True)
         return
 
-    settings.default_llm_name = llm_name
-    config_manager.write_settings(settings)
+    config_manager.update_setting("default_llm_name", llm_name)
     typer.echo(f"LLM with name {llm_name} set as default")
 
 
@@ -81,6 +83,7 @@ def get_data_dir() -> None:
     """
     Get the data directory path. This is where the books and decks are stored.
     """
+    config_manager = get_config_manager()
     settings = config_manager.read_settings()
     typer.echo(settings.data_dir)
 
@@ -92,9 +95,7 @@ def set_data_dir(
     """
     Set the data directory path. This is where the books and decks are stored.
     """
-    settings = config_manager.read_settings()
-    settings.data_dir = data_dir
-    config_manager.write_settings(settings)
+    get_config_manager().update_setting("data_dir", data_dir)
     typer.echo(f"Data directory set to {data_dir}")
 
 
@@ -103,6 +104,7 @@ def get_settings_dir() -> None:
     """
     Get the settings directory path. This is where the settings are stored.
     """
+    config_manager = get_config_manager()
     settings = config_manager.read_settings()
     typer.echo(settings.settings_dir)
 
@@ -118,9 +120,7 @@ def set_logging_level(
     """
     Set the logging level.
     """
-    settings = config_manager.read_settings()
-    settings.logger_level = level
-    config_manager.write_settings(settings)
+    get_config_manager().update_setting("logger_level", level)
     typer.echo(f"Logging level set to {level}")
 
 
@@ -129,4 +129,4 @@ def get_settings_path() -> None:
     """
     Get the path to the configuration file.
     """
-    typer.echo(config_manager.settings_path.as_posix())
+    typer.echo(get_config_manager().settings_path.as_posix())
@@ -1,17 +1,57 @@
+from __future__ import annotations
+
+import importlib
+import sys
 from pathlib import Path
-from typing import Optional
-from venv import logger
+from typing import Optional, TYPE_CHECKING
 
+from loguru import logger
 from typer import Typer, Argument, Option
 
-from src.app import get_service_factory
-from src.app.config import app as config_app
-from src.app.book import app as book_app
-from src.service.persitence_service import PersistenceService
+from src.app import get_llm_factory, get_persistence_factory, configure_logging
+from src.app._commands import extract_exercises, get_exercises_prompts
+from src.error import BookNotFoundException
+
+if TYPE_CHECKING:
+    from src.service.deck_from_prompt_service import DeckFromPromptService
+    from src.service.deck_service import DeckService
+    from src.service.pdf_parser import PDFParser
+    from src.service.persitence_service import PersistenceService
 
 app = Typer()
-app.add_typer(config_app, name="config", help="Configuration commands")
-app.add_typer(book_app, name="book", help="Book management commands")
+app.command()(extract_exercises)
+app.command()(get_exercises_prompts)
+
+
+@app.callback()
+def setup() -> None:
+    # runs only when a command is dispatched, so `--help` skips reading settings
+    configure_logging()
+
+
+_SUBCOMMANDS = {
+    "config": ("src.app.config", "Configuration commands"),
+    "book": ("src.app.book", "Book management commands"),
+}
+
+
+def _add_subcommands(argv: list[str]) -> None:
+    """
+    Register only the subcommand groups needed for this invocation, so running
+    a single command does not import every command module.
+    """
+    requested = argv[1] if len(argv) > 1 else None
+    if requested in _SUBCOMMANDS:
+        names = [requested]
+    elif requested is None or requested.startswith("-"):
+        names = list(_SUBCOMMANDS)
+    else:
+        names = []
+
+    for name in names:
+        module_path, help_ = _SUBCOMMANDS[name]
+        module = importlib.import_module(module_path)
+        app.add_typer(module.app, name=name, help=help_)
 
 
 @app.command()
@@ -27,16 +67,22 @@ def create_deck_from_book(
         None,
         help="This prompt will tell LLM how to generate the flashcards, otherwise the default prompt is used",
     ),
+    batch: bool = Option(
+        False,
+        help="Submit all pages as one OpenAI Batch API job. Half the cost, but can take up to 24h",
+    ),
 ) -> None:
     """
     Creates a deck of Anki flashcards out of a parsed textbook.
     """
-    from src.service.deck_service import DeckService
-
-    service_factory = get_service_factory(llm_name)
-    deck_service: DeckService = service_factory.deck_service()
+    service_factory = get_llm_factory(llm_name)
+    deck_service: DeckService = service_factory.deck_service
 
-    if custom_llm_prompt:
+    if batch:
+        deck_service.create_deck_batch(
+            book_name, start_page, end_page, out_dir, custom_llm_prompt
+        )
+    elif custom_llm_prompt:
         deck_service.create_deck(
             book_name, start_page, end_page, out_dir, custom_llm_prompt
         )
@@ -56,85 +102,30 @@ def create_deck_from_prompt(
     """
     Creates a deck of Anki flashcards out of a prompt.
     """
-    from src.service.deck_from_prompt_service import DeckFromPromptService
-
-    service_factory = get_service_factory(llm_name)
+    service_factory = get_llm_factory(llm_name)
     deck_from_prompt_service: DeckFromPromptService = (
-        service_factory.deck_from_prompt_service()
+        service_factory.deck_from_prompt_service
     )
     deck_from_prompt_service.create_deck(prompt, num_of_flashcards, out_dir)
 
 
-@app.command()
-def extract_exercises(
-    book_name: str = Argument(..., help="The name of the textbook"),
-    start_page: int = Argument(..., help="The starting page number"),
-    end_page: int = Argument(..., help="The ending page number"),
-    llm_name: Optional[str] = Argument(
-        None, help="The name of the LLM to use, if not given the default LLM is used"
-    ),
-) -> None:
-    """
-    Extracts exercises from a parsed textbook using the LLM.
-    """
-    from src.service.exercise_extraction_service import ExerciseExtractionService
-
-    service_factory = get_service_factory(llm_name)
-    exercise_extraction_service: ExerciseExtractionService = (
-        service_factory.exercise_extractor_service()
-    )
-    exercise_extraction_service.extract_exercises(
-        book_name=book_name, start_page=start_page, end_page=end_page
-    )
-
-
 @app.command()
 def parse_pdf(book_name: str) -> None:
     """
     Parse a PDF file into text using pdf-extract-api
     """
-    from src.service.pdf_parser import PDFParser
-
-    service_factory = get_service_factory(None)
+    service_factory = get_persistence_factory()
 
-    pdf_parser: PDFParser = service_factory.pdf_parser()
-    persistence_service: PersistenceService = service_factory.persistence_service()
+    pdf_parser: PDFParser = service_factory.pdf_parser
+    persistence_service: PersistenceService = service_factory.persistence_service
     saved_book = persistence_service.get_book(book_name)
     if saved_book is None:
-        raise ValueError(
-            f"Book with name {book_name} not found",
-            "available books are",
-            persistence_service.list_book_names(),
-        )
+        raise BookNotFoundException(book_name, persistence_service.list_book_names)
 
     logger.info(f"Starting to parse book {book_name}")
-    with saved_book.as_temp_pdf() as pdf_path:
-        pdf_parser.parse_pdf(book_name=book_name, pdf_path=pdf_path)
-
-
-@app.command()
-def get_exercises_prompts(
-    book_name: str = Argument(..., help="The name of the textbook"),
-    start_page: int = Argument(..., help="The starting page number"),
-    end_page: int = Argument(..., help="The ending page number"),
-    out_dir: Path = Argument(Path("."), help="The directory to save the exercises"),
-    llm_name: Optional[str] = Argument(
-        None, help="The name of the LLM to use, if not given the default LLM is used"
-    ),
-) -> None:
-    """
-    Get all the prompts of the exercises
-    """
-    from src.service.exercise_builder_service import ExerciseBuilderService
-
-    service_factory = get_service_factory(llm_name)
-    exercise_builder_service: ExerciseBuilderService = (
-        service_factory.exercise_builder_service()
-    )
-    exercise_builder_service.build_exercise_prompts(
-        book_name, out_dir, start_page, end_page
-    )
+    pdf_parser.parse_pdf(book_name=book_name, pdf_content=saved_book.book_content)
 
 
 if __name__ == "__main__":
+    _add_subcommands(sys.argv)
     app()
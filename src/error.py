@@ -1,2 +1,19 @@
+from typing import Callable
+
+
 class LanguageLearningMethodException(Exception):
     pass
+
+
+class BookNotFoundException(LanguageLearningMethodException):
+    def __init__(self, book_name: str, list_book_names: Callable[[], list[str]]):
+        super().__init__(book_name)
+        self.book_name = book_name
+        self._list_book_names = list_book_names
+
+    def __str__(self) -> str:
+        # available books are only looked up if the error actually gets rendered
+        return (
+            f"Book with name {self.book_name} not found, "
+            f"available books are: {self._list_book_names()}"
+        )
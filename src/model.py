@@ -1,6 +1,17 @@
+from dataclasses import field
+from typing import Any, Optional
+
 from pydantic import BaseModel
 
 
+class LLMConfig(BaseModel):
+    llm_class_path: str
+    llm_kwargs: dict[str, Any]
+    stop_words: Optional[list[str]] = None
+    rate_limit_rpm: Optional[int] = None
+    allowed_tools_regexps: list[str] = field(default_factory=list)
+
+
 class AnkiCard(BaseModel):
     front: str
     back: str
@@ -10,6 +21,15 @@ class AnkiDeck(BaseModel):
     cards: list[AnkiCard]
 
 
+class CombinedDeck(BaseModel):
+    grammar: AnkiDeck
+    vocabulary: AnkiDeck
+
+    @property
+    def cards(self) -> list[AnkiCard]:
+        return self.grammar.cards + self.vocabulary.cards
+
+
 class ExtractedExercise(BaseModel):
     title: str
     instructions: str
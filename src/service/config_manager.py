@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Optional, Any
 
 from appdirs import user_config_dir
 
@@ -10,18 +11,42 @@ class ConfigManager:
         self.config_dir = Path(user_config_dir(appname="language-learning-method"))
         if not self.config_dir.exists():
             self.config_dir.mkdir(parents=True)
+        self._cached: Optional[
+            tuple[tuple[int, int, int], LanguageLearningMethodSettings]
+        ] = None
+        self.dirty = False
 
     @property
     def settings_path(self) -> Path:
         return self.config_dir / "settings.json"
 
+    def _file_key(self) -> tuple[int, int, int]:
+        # mtime alone can miss a rewrite within the filesystem's timestamp granularity
+        st = self.settings_path.stat()
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
     def read_settings(self) -> LanguageLearningMethodSettings:
-        if not self.settings_path.exists():
+        try:
+            file_key = self._file_key()
+        except FileNotFoundError:
             return LanguageLearningMethodSettings()
 
-        with open(self.config_dir / "settings.json", "r") as file:
-            return LanguageLearningMethodSettings.model_validate_json(file.read())
+        if self._cached is not None and self._cached[0] == file_key:
+            return self._cached[1]
+
+        settings = LanguageLearningMethodSettings.model_validate_json(
+            self.settings_path.read_bytes()
+        )
+        self._cached = (file_key, settings)
+        return settings
 
     def write_settings(self, settings: LanguageLearningMethodSettings) -> None:
-        with open(self.settings_path, "w") as file:
-            file.write(settings.model_dump_json(indent=4))
+        self.settings_path.write_text(settings.model_dump_json(indent=4))
+        self._cached = (self._file_key(), settings)
+        self.dirty = True
+
+    def update_setting(self, field_name: str, value: Any) -> None:
+        """Change a single field of the current settings without re-validating the rest"""
+        settings = self.read_settings()
+        setattr(settings, field_name, value)
+        self.write_settings(settings)
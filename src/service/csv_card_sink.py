@@ -0,0 +1,65 @@
+import csv
+import hashlib
+import string
+import unicodedata
+from pathlib import Path
+from typing import List
+
+from loguru import logger
+
+from src.model import AnkiCard
+
+# the blank of cloze cards is kept, "Yo ___ estudiante" and "Yo estudiante" differ
+_PUNCTUATION = str.maketrans("", "", string.punctuation.replace("_", "") + "¿¡«»")
+
+
+class CsvCardSink:
+    """
+    Writes Anki cards to a CSV file as they are generated, flushing after each batch.
+    Cards repeating an already written one, up to case, whitespace and punctuation
+    on both sides, are dropped.
+    """
+
+    def __init__(self, file: Path) -> None:
+        self.file = file
+        self.cards_written = 0
+        self.duplicates_skipped = 0
+        self._seen_cards: set[bytes] = set()
+
+    def __enter__(self) -> "CsvCardSink":
+        self._file = open(
+            self.file, "w", newline="", encoding="utf-8", buffering=1 << 20
+        )
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(["front", "back"])
+        return self
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        normalized = unicodedata.normalize("NFKC", text).lower().translate(_PUNCTUATION)
+        return " ".join(normalized.split())
+
+    @classmethod
+    def _card_key(cls, card: AnkiCard) -> bytes:
+        # the same front with a different back is a different card, e.g. a
+        # translation and a conjugation of "ser"
+        key = cls._normalize(card.front) + "\0" + cls._normalize(card.back)
+        return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+    def _is_new(self, card: AnkiCard) -> bool:
+        key = self._card_key(card)
+        if key in self._seen_cards:
+            self.duplicates_skipped += 1
+            logger.info(f"Skipping duplicate card: {card.front}")
+            return False
+        self._seen_cards.add(key)
+        return True
+
+    def write_cards(self, cards: List[AnkiCard]) -> None:
+        unique_cards = [card for card in cards if self._is_new(card)]
+        self._writer.writerows((card.front, card.back) for card in unique_cards)
+        self._file.flush()
+        self.cards_written += len(unique_cards)
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self._file.close()
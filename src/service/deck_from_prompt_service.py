@@ -1,13 +1,13 @@
-import csv
+import asyncio
 from pathlib import Path
 from typing import List
 
 from loguru import logger
-from math import floor
 from pydantic import BaseModel
 
 from src.model import AnkiCard, AnkiDeck
-from src.service.llm_service import LLMService
+from src.service.csv_card_sink import CsvCardSink
+from src.service.llm_service import LLMService, RETRYABLE_ERRORS
 
 
 class Topic(BaseModel):
@@ -33,12 +33,7 @@ class DeckFromPromptService:
     - Relevant to the user's request
     """
 
-    _FLASHCARD_GENERATION_PROMPT = """Create comprehensive flashcards for the following topic in language learning:
-
-    Topic: {topic_name}
-    Description: {topic_description}
-    Level: {difficulty_level}
-    Number of cards to generate: {num_cards}
+    _FLASHCARD_GENERATION_PROMPT = """Create comprehensive flashcards for the language learning topic given by the user.
 
     Create cards that:
     - Break down complex concepts into digestible pieces
@@ -52,11 +47,18 @@ class DeckFromPromptService:
     - Comprehensive back side with examples and explanations
     """
 
+    _TOPIC_PROMPT_TEMPLATE = """Topic: {topic_name}
+Description: {topic_description}
+Level: {difficulty_level}
+Number of cards to generate: {num_cards}"""
+
     def __init__(
         self,
         llm_service: LLMService,
+        max_concurrency: int = 8,
     ):
         self.llm_service = llm_service
+        self.max_concurrency = max_concurrency
 
     def create_deck(self, prompt: str, num_of_flashcards: int, out_dir: Path) -> str:
         logger.info(f"Starting deck creation for prompt: {prompt[:100]}...")
@@ -65,19 +67,16 @@ class DeckFromPromptService:
         logger.info(f"Identified {len(topics.topics)} topics")
 
         # Calculate cards per topic (distribute evenly)
-        cards_per_topic = floor(num_of_flashcards / len(topics.topics))
-        remaining_cards = num_of_flashcards % len(topics.topics)
-
-        all_cards = []
-
-        # Generate cards for each topic
-        for i, topic in enumerate(topics.topics):
-            # Add an extra card to early topics if we have remaining cards
-            topic_cards = cards_per_topic + (1 if i < remaining_cards else 0)
-
-            cards = self._generate_cards_for_topic(topic, topic_cards)
-            all_cards.extend(cards)
-            logger.info(f"Generated {len(cards)} cards for topic: {topic.name}")
+        cards_per_topic, remaining_cards = divmod(num_of_flashcards, len(topics.topics))
+
+        # Add an extra card to early topics if we have remaining cards
+        cards_per_topics = [
+            cards_per_topic + (1 if i < remaining_cards else 0)
+            for i in range(len(topics.topics))
+        ]
+        all_cards = asyncio.run(
+            self._generate_cards_for_topics(topics.topics, cards_per_topics)
+        )
 
         if not all_cards:
             raise ValueError("No cards were generated")
@@ -95,11 +94,13 @@ class DeckFromPromptService:
     def _evaluate_prompt_into_topics(self, prompt: str) -> ListOfTopics:
         """Convert user prompt into structured topics"""
         logger.info("Evaluating prompt into topics...")
+        # requests differing only in whitespace share one LLM response cache entry
+        normalized_prompt = " ".join(prompt.split())
 
         try:
             topics: ListOfTopics = self.llm_service.prompt_with_structure(
                 system_prompt=self._TOPIC_EVALUATION_PROMPT,
-                prompt=prompt,
+                prompt=normalized_prompt,
                 response_model=ListOfTopics,
             )
             logger.info(f"Successfully identified {len(topics.topics)} topics")
@@ -108,11 +109,34 @@ class DeckFromPromptService:
             logger.exception(f"Error evaluating prompt into topics: {e}")
             raise
 
-    def _generate_cards_for_topic(self, topic: Topic, num_cards: int) -> List[AnkiCard]:
+    async def _generate_cards_for_topics(
+        self, topics: List[Topic], cards_per_topics: List[int]
+    ) -> List[AnkiCard]:
+        """Generate cards for all topics concurrently on one event loop"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def generate(topic: Topic, num_cards: int) -> List[AnkiCard]:
+            async with semaphore:
+                cards = await self._generate_cards_for_topic(topic, num_cards)
+            logger.info(f"Generated {len(cards)} cards for topic: {topic.name}")
+            return cards
+
+        card_lists = await asyncio.gather(
+            *(
+                generate(topic, num_cards)
+                for topic, num_cards in zip(topics, cards_per_topics)
+            )
+        )
+        return [card for cards in card_lists for card in cards]
+
+    async def _generate_cards_for_topic(
+        self, topic: Topic, num_cards: int
+    ) -> List[AnkiCard]:
         """Generate specified number of cards for a given topic"""
         logger.info(f"Generating {num_cards} cards for topic: {topic.name}")
 
-        formatted_prompt = self._FLASHCARD_GENERATION_PROMPT.format(
+        # the system prompt stays identical across topics so providers can cache it as a prefix
+        topic_prompt = self._TOPIC_PROMPT_TEMPLATE.format(
             topic_name=topic.name,
             topic_description=topic.description,
             difficulty_level=topic.difficulty_level,
@@ -120,12 +144,16 @@ class DeckFromPromptService:
         )
 
         try:
-            deck: AnkiDeck = self.llm_service.prompt_with_structure(
-                system_prompt=formatted_prompt,
-                prompt="Generate the flashcards as specified above.",
+            deck: AnkiDeck = await self.llm_service.aprompt_with_structure(
+                system_prompt=self._FLASHCARD_GENERATION_PROMPT,
+                prompt=topic_prompt,
                 response_model=AnkiDeck,
             )
             return deck.cards
+        except RETRYABLE_ERRORS as e:
+            # retries are exhausted, fail loudly instead of leaving a hole in the deck
+            logger.error(f"Giving up on topic {topic.name} after retries: {e}")
+            raise
         except Exception as e:
             logger.exception(f"Error generating cards for topic {topic.name}: {e}")
             return []
@@ -134,9 +162,8 @@ class DeckFromPromptService:
     def _save_to_csv(file: Path, cards: List[AnkiCard]) -> None:
         """Save generated cards to CSV file"""
         logger.info(f"Saving {len(cards)} cards to {file}")
-        with open(file, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["front", "back"])
-            for card in cards:
-                writer.writerow([card.front, card.back])
-        logger.info(f"Cards successfully saved to {file}")
+        with CsvCardSink(file) as sink:
+            sink.write_cards(cards)
+        if sink.duplicates_skipped:
+            logger.info(f"Skipped {sink.duplicates_skipped} duplicate cards")
+        logger.info(f"{sink.cards_written} cards successfully saved to {file}")
@@ -1,13 +1,16 @@
-import csv
+import hashlib
 import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Optional, Iterable, Iterator, Tuple, Type, Union
 
 from loguru import logger
 
-from src.model import AnkiDeck, AnkiCard
-from src.service.llm_service import LLMService
-from src.service.persitence_service import PersistenceService
+from src.model import AnkiDeck, AnkiCard, CombinedDeck
+from src.service.csv_card_sink import CsvCardSink
+from src.service.llm_batch_service import OpenAIBatchService, BatchRequest
+from src.service.llm_service import LLMService, RETRYABLE_ERRORS
+from src.service.persitence_service import PersistenceService, ParsedPage
 
 
 class DeckService:
@@ -67,13 +70,31 @@ Focus on:
 For each concept, create multiple cards that approach it from different angles. 
 """
 
+    _COMBINED_PROMPT = f"""Create two sets of Anki flashcards for the textbook page: grammar cards and vocabulary cards.
+Return them separately in the `grammar` and `vocabulary` fields.
+
+## Grammar cards
+{_GRAMMAR_PROMPT}
+## Vocabulary cards
+{_WORDS_PROMPT}"""
+
+    # pages shorter than this are blank or boilerplate (headers, page numbers)
+    _MIN_PAGE_CONTENT_LENGTH = 50
+    # ~3000 tokens at ~4 characters per token, chunks overlap by ~200 tokens
+    _MAX_CHUNK_CHARS = 12_000
+    _CHUNK_OVERLAP_CHARS = 800
+
     def __init__(
         self,
         llm_service: LLMService,
         persistence_service: PersistenceService,
+        max_concurrency: int = 8,
+        batch_service: Optional[OpenAIBatchService] = None,
     ):
         self.persistence_service = persistence_service
         self.llm_service = llm_service
+        self.max_concurrency = max_concurrency
+        self.batch_service = batch_service
 
     def create_deck(
         self,
@@ -89,30 +110,10 @@ For each concept, create multiple cards that approach it from different angles.
         logger.info(
             f"Starting deck creation from {book_name}, pages {start_page}-{end_page}"
         )
-        all_cards = []
-
-        for page_num in range(start_page, end_page + 1):
-            logger.info(f"Processing page {page_num}")
-            page = self.persistence_service.get_parsed_page(book_name, page_num)
-            if not page:
-                logger.info(f"No content for page {page_num}, skipping...")
-                continue
-
-            cards = self._generate_cards_for_page(page.content, page_num, system_prompt)
-            all_cards.extend(cards)
-
-        if not all_cards:
-            raise ValueError("No cards generated for the specified pages")
-
-        book_name = os.path.splitext(os.path.basename(book_name))[0]
-        filename = f"deck_{book_name}_{start_page}-{end_page}.csv"
-        output_file = out_dir / book_name / filename
-        if not output_file.parent.exists():
-            output_file.parent.mkdir(parents=True)
-
-        self._save_to_csv(output_file, all_cards)
-        logger.info(f"Deck created and saved to {filename}")
-        return filename
+        card_batches = self._generate_cards_for_pages(
+            book_name, start_page, end_page, system_prompt, AnkiDeck
+        )
+        return self._write_deck(book_name, start_page, end_page, out_dir, card_batches)
 
     def default_create_deck(
         self, book_name: str, start_page: int, end_page: int, out_dir: Path
@@ -123,78 +124,230 @@ For each concept, create multiple cards that approach it from different angles.
         logger.info(
             f"Starting deck creation from {book_name}, pages {start_page}-{end_page}"
         )
-        all_cards = []
+        # grammar and vocabulary cards come from one call, so the page is sent once
+        card_batches = self._generate_cards_for_pages(
+            book_name, start_page, end_page, self._COMBINED_PROMPT, CombinedDeck
+        )
+        return self._write_deck(book_name, start_page, end_page, out_dir, card_batches)
 
-        for page_num in range(start_page, end_page + 1):
-            logger.info(f"Processing page {page_num}")
-            page = self.persistence_service.get_parsed_page(book_name, page_num)
-            if not page:
-                logger.info(f"No content for page {page_num}, skipping...")
-                continue
+    def create_deck_batch(
+        self,
+        book_name: str,
+        start_page: int,
+        end_page: int,
+        out_dir: Path,
+        system_prompt: Optional[str] = None,
+    ) -> str:
+        """
+        Create an Anki deck like `create_deck` / `default_create_deck`, but submit all
+        pages as a single OpenAI Batch API job. Cheaper, but can take up to 24h.
+        """
+        if self.batch_service is None:
+            raise ValueError("Batch mode is not available for this LLM")
 
-            grammar_cards = self._generate_cards_for_page(
-                page.content, page_num, self._GRAMMAR_PROMPT
-            )
-            words_cards = self._generate_cards_for_page(
-                page.content, page_num, self._WORDS_PROMPT
+        logger.info(
+            f"Starting batch deck creation from {book_name}, pages {start_page}-{end_page}"
+        )
+        if system_prompt:
+            response_model = AnkiDeck
+        else:
+            system_prompt, response_model = self._COMBINED_PROMPT, CombinedDeck
+        requests = [
+            BatchRequest(
+                custom_id=f"page_{page.page_number}",
+                system_prompt=system_prompt,
+                prompt=self._build_page_prompt(page.content, page.page_number),
+                response_model=response_model,
             )
-            all_cards.extend(grammar_cards)
-            all_cards.extend(words_cards)
-
-        if not all_cards:
-            raise ValueError("No cards generated for the specified pages")
+            for page in self._get_pages(book_name, start_page, end_page)
+        ]
+        decks = self.batch_service.run(requests)
+
+        card_batches = (
+            decks[request.custom_id].cards
+            for request in requests
+            if request.custom_id in decks
+        )
+        return self._write_deck(book_name, start_page, end_page, out_dir, card_batches)
 
+    def _write_deck(
+        self,
+        book_name: str,
+        start_page: int,
+        end_page: int,
+        out_dir: Path,
+        card_batches: Iterable[List[AnkiCard]],
+    ) -> str:
+        """Write cards to the deck CSV as each batch arrives"""
         book_name = os.path.splitext(os.path.basename(book_name))[0]
         filename = f"deck_{book_name}_{start_page}-{end_page}.csv"
         output_file = out_dir / book_name / filename
         if not output_file.parent.exists():
             output_file.parent.mkdir(parents=True)
 
-        self._save_to_csv(output_file, all_cards)
-        logger.info(f"Deck created and saved to {filename}")
+        logger.info(f"Saving cards to {output_file}")
+        sink = CsvCardSink(output_file)
+        try:
+            with sink:
+                for cards in card_batches:
+                    sink.write_cards(cards)
+        except BaseException:
+            # a deck cut short by a failed page must not look finished, but the
+            # cards already paid for are kept next to it
+            if sink.cards_written:
+                partial_file = output_file.with_name(output_file.name + ".partial")
+                output_file.replace(partial_file)
+                logger.warning(
+                    f"Deck creation failed, {sink.cards_written} cards generated "
+                    f"so far are saved to {partial_file}"
+                )
+            else:
+                output_file.unlink(missing_ok=True)
+            raise
+
+        if not sink.cards_written:
+            output_file.unlink(missing_ok=True)
+            raise ValueError("No cards generated for the specified pages")
+
+        if sink.duplicates_skipped:
+            logger.info(f"Skipped {sink.duplicates_skipped} duplicate cards")
+        logger.info(f"Deck with {sink.cards_written} cards saved to {filename}")
         return filename
 
+    def _get_pages(
+        self, book_name: str, start_page: int, end_page: int
+    ) -> List[ParsedPage]:
+        pages = self.persistence_service.get_parsed_pages(
+            book_name, start_page, end_page
+        )
+        for page_num in range(start_page, end_page + 1):
+            if page_num not in pages:
+                logger.info(f"No content for page {page_num}, skipping...")
+        return list(pages.values())
+
+    def _generate_cards_for_pages(
+        self,
+        book_name: str,
+        start_page: int,
+        end_page: int,
+        system_prompt: str,
+        response_model: Type[Union[AnkiDeck, CombinedDeck]],
+    ) -> Iterator[List[AnkiCard]]:
+        """
+        Generate cards for every parsed page in the range.
+        LLM calls run concurrently; card lists are yielded in page order.
+        Pages with identical content share a single LLM call.
+        """
+        pages = self._get_pages(book_name, start_page, end_page)
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            seen: Dict[bytes, Tuple[int, List[Future]]] = {}
+            page_futures = []
+            for page in pages:
+                if len(page.content.strip()) < self._MIN_PAGE_CONTENT_LENGTH:
+                    logger.info(f"Page {page.page_number} has no content, skipping...")
+                    continue
+                content_hash = hashlib.blake2b(
+                    page.content.encode("utf-8"), digest_size=16
+                ).digest()
+                if content_hash in seen:
+                    first_page_num, futures = seen[content_hash]
+                    logger.info(
+                        f"cache-hit page {page.page_number} -> same as page {first_page_num}"
+                    )
+                else:
+                    # every chunk of an oversized page is a separate, concurrent call
+                    futures = [
+                        executor.submit(
+                            self._generate_cards_for_page,
+                            chunk,
+                            page.page_number,
+                            system_prompt,
+                            response_model,
+                        )
+                        for chunk in self._split_content(page.content)
+                    ]
+                    seen[content_hash] = (page.page_number, futures)
+                page_futures.append(futures)
+            try:
+                for futures in page_futures:
+                    if len(futures) == 1:
+                        yield futures[0].result()
+                    else:
+                        yield self._dedup_cards(
+                            card for future in futures for card in future.result()
+                        )
+            except BaseException:
+                # pages still queued are dropped instead of being paid for after a
+                # failure, only the calls already in flight are awaited
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    @classmethod
+    def _split_content(cls, content: str) -> List[str]:
+        """
+        Split an oversized page into overlapping chunks. LLM cost grows faster than
+        linearly with prompt length, so a few smaller calls are cheaper than one long one.
+        """
+        if len(content) <= cls._MAX_CHUNK_CHARS:
+            return [content]
+        step = cls._MAX_CHUNK_CHARS - cls._CHUNK_OVERLAP_CHARS
+        chunks = []
+        for start in range(0, len(content), step):
+            chunks.append(content[start : start + cls._MAX_CHUNK_CHARS])
+            if start + cls._MAX_CHUNK_CHARS >= len(content):
+                break
+        return chunks
+
+    @staticmethod
+    def _dedup_cards(cards: Iterable[AnkiCard]) -> List[AnkiCard]:
+        """Drop cards repeated by overlapping chunks, keeping the first occurrence"""
+        unique = {}
+        for card in cards:
+            unique.setdefault((card.front, card.back), card)
+        return list(unique.values())
+
     def _generate_cards_for_page(
-        self, content: str, page_num: int, system_prompt: str
+        self,
+        content: str,
+        page_num: int,
+        system_prompt: str,
+        response_model: Type[Union[AnkiDeck, CombinedDeck]] = AnkiDeck,
     ) -> List[AnkiCard]:
         """Generate Anki cards for a single page using GPT-4"""
         logger.info(f"Generating cards for page {page_num}")
-
-        user_prompt = f"""Create Anki cards for this textbook page content:
-
-{content}
-
-Focus on creating cards that:
-- Break down complex grammar concepts into digestible pieces
-- Include real-world usage examples
-- Highlight cultural context when relevant
-- Create connections between related concepts
-- Include common mistakes to avoid
-
-Page number for reference: {page_num}"""
-
+        user_prompt = self._build_page_prompt(content, page_num)
         logger.info("Sending request to OpenAI for card generation...")
 
         try:
-            logger.debug(f"LLM response received for page {page_num}")
-            deck: AnkiDeck = self.llm_service.prompt_with_structure(
-                system_prompt=system_prompt, prompt=user_prompt, response_model=AnkiDeck
+            deck = self.llm_service.prompt_with_structure(
+                system_prompt=system_prompt,
+                prompt=user_prompt,
+                response_model=response_model,
             )
+            logger.debug(f"LLM response received for page {page_num}")
             cards = deck.cards
             logger.info(f"Generated {len(cards)} cards for page {page_num}")
             logger.debug(cards)
             return cards
+        except RETRYABLE_ERRORS as e:
+            # retries are exhausted, fail loudly instead of leaving a hole in the deck
+            logger.error(f"Giving up on page {page_num} after retries: {e}")
+            raise
         except Exception as e:
             logger.exception(f"Error processing page {page_num}: {e}")
             return []
 
     @staticmethod
-    def _save_to_csv(file: Path, cards: List[AnkiCard]) -> None:
-        """Save generated cards to CSV file"""
-        logger.info(f"Saving {len(cards)} cards to {file}")
-        with open(file, "w", newline="", encoding="utf-8") as f:
-            writer = csv.writer(f)
-            writer.writerow(["front", "back"])
-            for card in cards:
-                writer.writerow([card.front, card.back])
-        logger.info(f"Cards successfully saved to {file}")
+    def _build_page_prompt(content: str, page_num: int) -> str:
+        return f"""Create Anki cards for this textbook page content:
+
+{content}
+
+Focus on creating cards that:
+- Break down complex grammar concepts into digestible pieces
+- Include real-world usage examples
+- Highlight cultural context when relevant
+- Create connections between related concepts
+- Include common mistakes to avoid
+
+Page number for reference: {page_num}"""
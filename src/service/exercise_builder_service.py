@@ -1,3 +1,7 @@
+import hashlib
+import json
+from itertools import groupby
+from operator import attrgetter
 from pathlib import Path
 from typing import List, Optional
 
@@ -29,10 +33,14 @@ In your speaking, use a friendly, encouraging tone. For example:
 Don't write out of character. Only produce what you would say to the student as their Spanish teacher.
 """
 
+    # maps prompt filenames of a page to the hash of their content, so reruns skip unchanged files
+    _MANIFEST_FILENAME = ".manifest.json"
+
     def __init__(self, data_dir: Path = DATA_DIR):
         self.data_dir = data_dir
         self.exercises_dir = self.data_dir / "exercises"
         self.persistence_service = PersistenceService()
+        self._ensured_dirs: set[Path] = set()
         logger.info(
             f"ExerciseBuilderService initialized with data directory: {self.data_dir}"
         )
@@ -48,24 +56,19 @@ Don't write out of character. Only produce what you would say to the student as
 
         if start_page is not None and end_page is not None:
             logger.info(f"Processing pages {start_page} to {end_page}")
-            # Process exercises page by page
-            for page_num in range(start_page, end_page + 1):
-                exercises = self.persistence_service.get_exercises(book_name, page_num)
-                if exercises:
-                    self._process_page_exercises(book_name, page_num, exercises)
         else:
             logger.info("Processing all exercises for the book")
-            # Get all exercises and group them by page
-            all_exercises = self.persistence_service.get_exercises(book_name)
-            exercises_by_page = {}
-            for exercise in all_exercises:
-                exercises_by_page.setdefault(exercise.page_number, []).append(exercise)
-
-            # Process each page's exercises
-            for page_num, page_exercises in exercises_by_page.items():
-                self._process_page_exercises(
-                    book_name, page_num, page_exercises, out_dir
-                )
+
+        # exercises come sorted by page, so each page is one consecutive group
+        exercises = self.persistence_service.get_exercises(
+            book_name, start_page=start_page, end_page=end_page
+        )
+        for page_num, page_exercises in groupby(
+            exercises, key=attrgetter("page_number")
+        ):
+            self._process_page_exercises(
+                book_name, page_num, list(page_exercises), out_dir
+            )
 
     def _process_page_exercises(
         self,
@@ -83,10 +86,32 @@ Don't write out of character. Only produce what you would say to the student as
             exercises: List of exercises to process
         """
         output_dir = self._ensure_output_directory(book_name, page_num, out_dir)
+        manifest_path = output_dir / self._MANIFEST_FILENAME
+        manifest = (
+            json.loads(manifest_path.read_text(encoding="utf-8"))
+            if manifest_path.exists()
+            else {}
+        )
+        manifest_changed = False
 
         for i, exercise in enumerate(exercises, start=1):
             prompt = self._build_teacher_prompt(exercise)
+            filename = self._prompt_filename(page_num, i)
+            prompt_hash = hashlib.blake2b(
+                prompt.encode("utf-8"), digest_size=8
+            ).hexdigest()
+            if (
+                manifest.get(filename) == prompt_hash
+                and (output_dir / filename).exists()
+            ):
+                logger.debug(f"Exercise {i} from page {page_num} unchanged, skipping")
+                continue
             self._save_prompt(output_dir, page_num, i, prompt)
+            manifest[filename] = prompt_hash
+            manifest_changed = True
+
+        if manifest_changed:
+            manifest_path.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
 
     def _build_teacher_prompt(self, exercise: StoredExercise) -> str:
         """
@@ -98,7 +123,9 @@ Don't write out of character. Only produce what you would say to the student as
         Returns:
             str: Formatted teacher prompt
         """
-        questions_text = "\n".join([f"- {q}" for q in exercise.questions])
+        questions_text = (
+            "- " + "\n- ".join(exercise.questions) if exercise.questions else ""
+        )
         return self._TEACHER_PROMPT_TEMPLATE.format(
             title=exercise.title,
             instructions=exercise.instructions,
@@ -119,9 +146,15 @@ Don't write out of character. Only produce what you would say to the student as
             Path: Path to the output directory
         """
         output_dir = out_dir / f"{book_name}_exercises" / f"page_{page_num}"
-        output_dir.mkdir(parents=True, exist_ok=True)
+        if output_dir not in self._ensured_dirs:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            self._ensured_dirs.add(output_dir)
         return output_dir
 
+    @staticmethod
+    def _prompt_filename(page_num: int, exercise_num: int) -> str:
+        return f"exercise_page_{page_num}_exercise_{exercise_num}.md"
+
     @staticmethod
     def _save_prompt(
         output_dir: Path, page_num: int, exercise_num: int, prompt: str
@@ -135,8 +168,9 @@ Don't write out of character. Only produce what you would say to the student as
             exercise_num: Exercise number
             prompt: Prompt content to save
         """
-        filename = f"exercise_page_{page_num}_exercise_{exercise_num}.md"
-        file_path = output_dir / filename
+        file_path = output_dir / ExerciseBuilderService._prompt_filename(
+            page_num, exercise_num
+        )
 
         logger.info(
             f"Saving exercise {exercise_num} from page {page_num} to {file_path}"
@@ -1,13 +1,14 @@
+import asyncio
 import os
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
 from loguru import logger
 
 from src.constants import DATA_DIR
 from src.model import ExtractedExercises, ExtractedExercise
 from src.service.llm_service import LLMService
-from src.service.persitence_service import PersistenceService
+from src.service.persitence_service import PersistenceService, ParsedPage
 
 
 class ExerciseExtractionService:
@@ -45,8 +46,10 @@ Don't write out of character. Only produce what you would say to the student as
         persistence_service: PersistenceService,
         llm_service: LLMService,
         data_dir: Path = DATA_DIR,
+        max_concurrency: int = 8,
     ):
         self.data_dir = data_dir
+        self.max_concurrency = max_concurrency
         self.exercises_dir = self.data_dir / "exercises"
         if not self.exercises_dir.exists():
             self.exercises_dir.mkdir(parents=True)
@@ -64,23 +67,41 @@ Don't write out of character. Only produce what you would say to the student as
         logger.info(
             f"Starting exercise extraction from {book_name}, pages {start_page}-{end_page}"
         )
+        pages = self.persistence_service.get_parsed_pages(
+            book_name, start_page, end_page
+        )
+        asyncio.run(self._extract_exercises_from_pages(book_name, pages))
 
-        for page_num in range(start_page, end_page + 1):
-            logger.info(f"Processing page {page_num}")
-            page = self.persistence_service.get_parsed_page(book_name, page_num)
-            if not page or not page.content.strip():
-                logger.info(f"No content for page {page_num}, skipping...")
-                continue
-
-            exercises = self._extract_exercises_from_page(page.content, page_num)
+    async def _extract_exercises_from_pages(
+        self, book_name: str, pages: Dict[int, ParsedPage]
+    ) -> None:
+        """Extract exercises of all pages concurrently on one event loop"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def extract(page: ParsedPage) -> None:
+            async with semaphore:
+                exercises = await self._extract_exercises_from_page(
+                    page.content, page.page_number
+                )
             if not exercises:
-                logger.info(f"No exercises found on page {page_num}")
-                continue
+                logger.info(f"No exercises found on page {page.page_number}")
+                return
+
+            # Save each exercise as a separate MD file, off the event loop so that
+            # disk writes overlap with the LLM calls of other pages
+            await asyncio.to_thread(
+                self._save_exercises, page.page_number, exercises, book_name
+            )
 
-            # Save each exercise as a separate MD file
-            self._save_exercises(page_num, exercises, book_name)
+        tasks = []
+        for page in pages.values():
+            if not page.content.strip():
+                logger.info(f"No content for page {page.page_number}, skipping...")
+                continue
+            tasks.append(extract(page))
+        await asyncio.gather(*tasks)
 
-    def _extract_exercises_from_page(
+    async def _extract_exercises_from_page(
         self, content: str, page_num: int
     ) -> List[ExtractedExercise]:
         """
@@ -89,15 +110,16 @@ Don't write out of character. Only produce what you would say to the student as
         logger.info(f"Extracting exercises for page {page_num}")
         user_prompt = f"Page content:\n\n{content}"
 
-        response = self.llm_service.prompt_with_structure(
-            prompt=self._EXTRACTION_PROMPT,
-            response_model=ExtractedExercises,
-            system_prompt=user_prompt,
-        )
-
         try:
+            response: ExtractedExercises = (
+                await self.llm_service.aprompt_with_structure(
+                    prompt=user_prompt,
+                    response_model=ExtractedExercises,
+                    system_prompt=self._EXTRACTION_PROMPT,
+                )
+            )
             logger.debug(f"LLM response received for page {page_num}")
-            exercises = response.choices[0].message.parsed.exercises
+            exercises = response.exercises
             logger.info(f"Extracted {len(exercises)} exercises from page {page_num}")
             logger.debug(exercises)
             return exercises
@@ -117,7 +139,9 @@ Don't write out of character. Only produce what you would say to the student as
             output_dir.mkdir(parents=True)
 
         for i, exercise in enumerate(exercises, start=1):
-            questions_text = "\n".join([f"- {q}" for q in exercise.questions])
+            questions_text = (
+                "- " + "\n- ".join(exercise.questions) if exercise.questions else ""
+            )
             teacher_prompt = self._TEACHER_PROMPT_TEMPLATE.format(
                 title=exercise.title,
                 instructions=exercise.instructions,
@@ -0,0 +1,135 @@
+import json
+import time
+from dataclasses import dataclass
+from typing import Optional, Type
+
+from loguru import logger
+from pydantic import BaseModel
+
+from src.error import LanguageLearningMethodException
+from src.model import LLMConfig
+from src.service.llm_service import adapter_for, schema_for
+
+
+@dataclass
+class BatchRequest:
+    custom_id: str
+    system_prompt: str
+    prompt: str
+    response_model: Type[BaseModel]
+
+
+class OpenAIBatchService:
+    """
+    Submits many structured chat completions as one OpenAI Batch API job.
+    Batches are billed at half price but may take up to 24h to complete.
+    """
+
+    _SUPPORTED_CLASS_PATHS = {"langchain_openai.ChatOpenAI"}
+    _FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+    def __init__(
+        self,
+        llm_config: LLMConfig,
+        initial_poll_interval: float = 5.0,
+        max_poll_interval: float = 300.0,
+    ) -> None:
+        self.llm_config = llm_config
+        self.initial_poll_interval = initial_poll_interval
+        self.max_poll_interval = max_poll_interval
+
+    def _client(self):
+        from openai import OpenAI
+
+        kwargs = self.llm_config.llm_kwargs
+        return OpenAI(api_key=kwargs.get("api_key") or kwargs.get("openai_api_key"))
+
+    def _request_body(self, request: BatchRequest) -> dict:
+        kwargs = self.llm_config.llm_kwargs
+        body = {
+            "model": kwargs.get("model_name") or kwargs.get("model"),
+            "messages": [
+                {"role": "system", "content": request.system_prompt},
+                {"role": "user", "content": request.prompt},
+            ],
+            "response_format": {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": request.response_model.__name__,
+                    "schema": schema_for(request.response_model),
+                },
+            },
+        }
+        if "temperature" in kwargs:
+            body["temperature"] = kwargs["temperature"]
+        if self.llm_config.stop_words:
+            body["stop"] = self.llm_config.stop_words
+        return body
+
+    def run(self, requests: list[BatchRequest]) -> dict[str, BaseModel]:
+        """
+        Submit the requests, wait for the batch to finish and return the parsed
+        responses keyed by custom_id. Failed requests are logged and left out.
+        """
+        if self.llm_config.llm_class_path not in self._SUPPORTED_CLASS_PATHS:
+            raise LanguageLearningMethodException(
+                f"Batch mode is only supported for {self._SUPPORTED_CLASS_PATHS}, "
+                f"got {self.llm_config.llm_class_path}"
+            )
+
+        client = self._client()
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": request.custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": self._request_body(request),
+                }
+            )
+            for request in requests
+        ]
+        batch_file = client.files.create(
+            file=("requests.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch",
+        )
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        logger.info(f"Submitted batch {batch.id} with {len(requests)} requests")
+
+        poll_interval = self.initial_poll_interval
+        while batch.status not in self._FINAL_STATUSES:
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, self.max_poll_interval)
+            batch = client.batches.retrieve(batch.id)
+            logger.debug(f"Batch {batch.id} status: {batch.status}")
+
+        if batch.status != "completed" or not batch.output_file_id:
+            raise LanguageLearningMethodException(
+                f"Batch {batch.id} finished with status {batch.status}"
+            )
+
+        response_models = {r.custom_id: r.response_model for r in requests}
+        results = {}
+        output = client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = record["custom_id"]
+            response: Optional[dict] = record.get("response")
+            if record.get("error") or not response or response["status_code"] != 200:
+                logger.error(f"Batch request {custom_id} failed: {record}")
+                continue
+
+            content = response["body"]["choices"][0]["message"]["content"]
+            try:
+                results[custom_id] = adapter_for(
+                    response_models[custom_id]
+                ).validate_json(content)
+            except ValueError as e:
+                logger.exception(f"Invalid response for batch request {custom_id}: {e}")
+        return results
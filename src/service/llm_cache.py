@@ -0,0 +1,94 @@
+import atexit
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Type
+
+from loguru import logger
+from pydantic import BaseModel
+
+from src.constants import DATA_DIR
+from src.model import LLMConfig
+from src.service.llm_service import schema_for
+
+
+class LLMResponseCache:
+    """
+    Exact-match cache of structured LLM responses, persisted in a sqlite database.
+    Keys are a sha256 of the LLM config, both prompts and the response schema.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path = DATA_DIR,
+        db_path: str = "llm_cache.db",
+        ttl_seconds: Optional[int] = None,
+    ):
+        if not data_dir.exists():
+            data_dir.mkdir(parents=True)
+        self.db_path = (data_dir / db_path).as_posix()
+        self.ttl_seconds = ttl_seconds
+        # one connection for the lifetime of the cache, shared between the page
+        # threads under a lock instead of reconnecting on every lookup
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._lock = threading.Lock()
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        atexit.unregister(self.close)
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def make_key(
+        llm_config: LLMConfig,
+        system_prompt: str,
+        prompt: str,
+        response_model: Type[BaseModel],
+    ) -> str:
+        payload = json.dumps(
+            {
+                "llm_class_path": llm_config.llm_class_path,
+                "llm_kwargs": llm_config.llm_kwargs,
+                "system": system_prompt,
+                "prompt": prompt,
+                "schema": schema_for(response_model),
+            },
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        if self.ttl_seconds is not None and time.time() - row[1] > self.ttl_seconds:
+            logger.debug(f"LLM cache entry {key} expired")
+            return None
+        return row[0]
+
+    def set(self, key: str, response: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, response, created_at) VALUES (?, ?, ?)",
+                (key, response, time.time()),
+            )
@@ -1,27 +1,70 @@
 import importlib
 from collections.abc import AsyncIterator
-from dataclasses import field
-from functools import cached_property
-from typing import Optional, Union, Type, Any
+from functools import cached_property, lru_cache
+from typing import Optional, Union, Type, TYPE_CHECKING
 
 from langchain_core.language_models import BaseChatModel, BaseLLM
 from langchain_core.messages import AIMessageChunk, SystemMessage, HumanMessage
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.runnables import Runnable
 from loguru import logger
-from pydantic import BaseModel
+from openai import (
+    APIConnectionError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+from pydantic import BaseModel, TypeAdapter
 
+from src.model import LLMConfig
 
-class LLMConfig(BaseModel):
-    llm_class_path: str
-    llm_kwargs: dict[str, Any]
-    stop_words: Optional[list[str]] = None
-    allowed_tools_regexps: list[str] = field(default_factory=list)
+if TYPE_CHECKING:
+    from src.service.llm_cache import LLMResponseCache
+
+# provider errors which are worth retrying, everything else fails the request right away
+RETRYABLE_ERRORS = (
+    RateLimitError,
+    APITimeoutError,
+    APIConnectionError,
+    InternalServerError,
+)
+
+
+@lru_cache(maxsize=None)
+def schema_for(response_model: Type[BaseModel]) -> dict:
+    """JSON schema of a response model, built once per class"""
+    return response_model.model_json_schema()
+
+
+@lru_cache(maxsize=None)
+def adapter_for(response_model: Type[BaseModel]) -> TypeAdapter:
+    """Validator of a response model, compiled once per class"""
+    return TypeAdapter(response_model)
 
 
 class LLMService:
-    def __init__(self, llm_config: LLMConfig) -> None:
+    MAX_ATTEMPTS = 6
+
+    def __init__(
+        self,
+        llm_config: LLMConfig,
+        response_cache: Optional["LLMResponseCache"] = None,
+    ) -> None:
         self.llm_config = llm_config
+        self.response_cache = response_cache
+        self._structured_llms: dict[Type[BaseModel], Runnable] = {}
         self.DEFAULT_SYSTEM_PROMPT = "You're a helpful assistant"
 
+    @property
+    def _is_deterministic(self) -> bool:
+        # only responses of a zero-temperature LLM are worth caching
+        return self.llm_config.llm_kwargs.get("temperature") == 0
+
+    @property
+    def _supports_prompt_caching(self) -> bool:
+        # OpenAI caches prompt prefixes automatically, Anthropic needs an explicit marker
+        return self.llm_config.llm_class_path.startswith("langchain_anthropic.")
+
     @cached_property
     def _llm(self) -> Union[BaseLLM, BaseChatModel]:
         try:
@@ -39,8 +82,17 @@ class LLMService:
             raise ValueError(
                 f"Class {self.llm_config.llm_class_path} has to be of type BaseChatModel or BaseLLM"
             )
+        llm_kwargs = dict(self.llm_config.llm_kwargs)
+        if self.llm_config.rate_limit_rpm and issubclass(llm_class, BaseChatModel):
+            # the LLM instance is shared between worker threads, so is the limiter
+            llm_kwargs.setdefault(
+                "rate_limiter",
+                InMemoryRateLimiter(
+                    requests_per_second=self.llm_config.rate_limit_rpm / 60
+                ),
+            )
         try:
-            return llm_class(**self.llm_config.llm_kwargs)
+            return llm_class(**llm_kwargs)
         except Exception as e:
             raise ValueError(f"Error while creating LLM {llm_class}: {e}") from e
 
@@ -48,9 +100,17 @@ class LLMService:
         """Prepare messages list with optional system prompt."""
         messages = []
         if isinstance(self._llm, BaseChatModel):
-            messages.append(
-                SystemMessage(content=system_prompt or self.DEFAULT_SYSTEM_PROMPT)
-            )
+            system_content = system_prompt or self.DEFAULT_SYSTEM_PROMPT
+            if self._supports_prompt_caching:
+                # mark the system prompt so its prefill is reused between requests
+                system_content = [
+                    {
+                        "type": "text",
+                        "text": system_content,
+                        "cache_control": {"type": "ephemeral"},
+                    }
+                ]
+            messages.append(SystemMessage(content=system_content))
         messages.append(HumanMessage(content=prompt))
         return messages
 
@@ -116,25 +176,97 @@ class LLMService:
         logger.debug(f"LLM answer: {answer}")
         return answer
 
+    def _structure_cache_key(
+        self,
+        prompt: str,
+        response_model: Type["BaseModel"],
+        system_prompt: Optional[str],
+    ) -> Optional[str]:
+        if self.response_cache is None or not self._is_deterministic:
+            return None
+        return self.response_cache.make_key(
+            self.llm_config,
+            system_prompt or self.DEFAULT_SYSTEM_PROMPT,
+            prompt,
+            response_model,
+        )
+
+    def _cached_structure(
+        self, cache_key: Optional[str], response_model: Type["BaseModel"]
+    ) -> Optional["BaseModel"]:
+        if cache_key is None:
+            return None
+        # the cache only saves calls, a broken or unreadable entry is a miss
+        try:
+            cached = self.response_cache.get(cache_key)
+            if cached is None:
+                return None
+            answer = adapter_for(response_model).validate_json(cached)
+        except Exception as e:
+            logger.warning(f"LLM response cache lookup failed, ignoring it: {e}")
+            return None
+        logger.debug(f"LLM response cache hit for key: {cache_key}")
+        return answer
+
+    def _llm_with_structure(self, response_model: Type["BaseModel"]):
+        """Structured-output runnable for the response model, built once per model"""
+        runnable = self._structured_llms.get(response_model)
+        if runnable is None:
+            runnable = self._llm.with_structured_output(response_model).with_retry(
+                retry_if_exception_type=RETRYABLE_ERRORS,
+                wait_exponential_jitter=True,
+                stop_after_attempt=self.MAX_ATTEMPTS,
+            )
+            self._structured_llms[response_model] = runnable
+        return runnable
+
+    def _structure_input(self, prompt: str, system_prompt: Optional[str]):
+        if isinstance(self._llm, BaseChatModel):
+            return self._prepare_messages(prompt, system_prompt)
+        return self._prepare_prompt(prompt, system_prompt)
+
+    def _store_structure(self, cache_key: Optional[str], answer: "BaseModel") -> None:
+        logger.debug(f"LLM answer: {answer}")
+        if cache_key is not None and isinstance(answer, BaseModel):
+            try:
+                self.response_cache.set(cache_key, answer.model_dump_json())
+            except Exception as e:
+                logger.warning(f"Failed to cache LLM response, ignoring it: {e}")
+
     def prompt_with_structure(
         self,
         prompt: str,
         response_model: Type["BaseModel"],
         system_prompt: Optional[str] = None,
     ) -> "BaseModel":
+        cache_key = self._structure_cache_key(prompt, response_model, system_prompt)
+        cached = self._cached_structure(cache_key, response_model)
+        if cached is not None:
+            return cached
+
         logger.debug(f"Prompting LLM {self._llm.name} with: {prompt}")
-        llm_with_structure = self._llm.with_structured_output(response_model)
+        answer = self._llm_with_structure(response_model).invoke(
+            input=self._structure_input(prompt, system_prompt),
+            stop=self.llm_config.stop_words,
+        )
+        self._store_structure(cache_key, answer)
+        return answer
 
-        if isinstance(self._llm, BaseChatModel):
-            messages = self._prepare_messages(prompt, system_prompt)
-            answer = llm_with_structure.invoke(
-                input=messages, stop=self.llm_config.stop_words
-            )
-        else:
-            prepared_prompt = self._prepare_prompt(prompt, system_prompt)
-            answer = llm_with_structure.invoke(
-                input=prepared_prompt, stop=self.llm_config.stop_words
-            )
+    async def aprompt_with_structure(
+        self,
+        prompt: str,
+        response_model: Type["BaseModel"],
+        system_prompt: Optional[str] = None,
+    ) -> "BaseModel":
+        cache_key = self._structure_cache_key(prompt, response_model, system_prompt)
+        cached = self._cached_structure(cache_key, response_model)
+        if cached is not None:
+            return cached
 
-        logger.debug(f"LLM answer: {answer}")
+        logger.debug(f"Prompting LLM {self._llm.name} with: {prompt}")
+        answer = await self._llm_with_structure(response_model).ainvoke(
+            input=self._structure_input(prompt, system_prompt),
+            stop=self.llm_config.stop_words,
+        )
+        self._store_structure(cache_key, answer)
         return answer
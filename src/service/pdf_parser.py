@@ -1,4 +1,5 @@
-import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 
@@ -8,44 +9,105 @@ from src.constants import DATA_DIR
 from src.error import LanguageLearningMethodException
 from src.service.pdf_splitter import PDFSplitter
 from src.service.persitence_service import PersistenceService, ParsedPage
-from src.service.text_extraction_service import TextExtractionService
+from src.service.text_extraction_service import (
+    ExtractionResult,
+    TextExtractionService,
+)
 
 
 class PDFParser:
-    def __init__(self, data_dir: Path = DATA_DIR):
+    def __init__(
+        self,
+        persistence_service: PersistenceService,
+        pdf_splitter: PDFSplitter,
+        data_dir: Path = DATA_DIR,
+        max_concurrency: int = 8,
+    ):
         self.data_dir = data_dir
+        self.max_concurrency = max_concurrency
         if not self.data_dir.exists():
             self.data_dir.mkdir()
 
-        self.persistence_service = PersistenceService()
-        self.pdf_splitter = PDFSplitter()
+        self.persistence_service = persistence_service
+        self.pdf_splitter = pdf_splitter
         self.text_extraction_service = TextExtractionService()
 
-    def parse_pdf(self, book_name: str, pdf_path: Path) -> None:
-        pages = self.pdf_splitter.split_pdf(pdf_path)
-        logger.info(f"Split PDF into {len(pages)} pages")
-
-        for page_num in sorted(pages.keys()):
-            page = pages[page_num]
-            if not self.persistence_service.is_page_parsed(book_name, page_num):
-                start_time = datetime.now()
-                result = self.text_extraction_service.extract_text(page)
-                if result.error:
-                    raise LanguageLearningMethodException(
-                        f"Error extracting text from page {page_num}: {result.error}"
-                    )
-                end_time = datetime.now()
-                logger.info(
-                    f"Extracted text from page {page_num + 1} in {end_time - start_time}"
+    def parse_pdf(self, book_name: str, pdf_content: bytes) -> None:
+        parsed_pages = self.persistence_service.get_parsed_page_numbers(book_name)
+        pages = self.pdf_splitter.split_pdf(pdf_content, skip_pages=parsed_pages)
+        logger.info(
+            f"Split {len(pages)} pages to parse, {len(parsed_pages)} already parsed"
+        )
+
+        page_nums = sorted(pages.keys())
+        parsed_batch: list[ParsedPage] = []
+        # OCR requests run concurrently, results are stored in page order on this thread
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [
+                executor.submit(
+                    self._extract_page, book_name, page_num, pages[page_num]
                 )
-                if result.extracted_text:
-                    parsed_page = ParsedPage(
-                        book_path=book_name,
-                        page_number=page_num,
-                        content=result.extracted_text,
-                        parsed_at=datetime.now(),
-                        extraction_task_id=result.task_id,
+                for page_num in page_nums
+            ]
+            consumed = 0
+            try:
+                for page_num, future in zip(page_nums, futures):
+                    result, elapsed_ms = future.result()
+                    consumed += 1
+                    if result.error:
+                        raise LanguageLearningMethodException(
+                            f"Error extracting text from page {page_num}: {result.error}"
+                        )
+                    logger.info(
+                        f"Extracted text from page {page_num + 1} in {elapsed_ms:.1f} ms"
+                    )
+                    if result.extracted_text:
+                        parsed_batch.append(
+                            self._parsed_page(book_name, page_num, result)
+                        )
+                    if len(parsed_batch) >= self.max_concurrency:
+                        self.persistence_service.store_parsed_pages(parsed_batch)
+                        parsed_batch = []
+            except BaseException:
+                # pages not sent to OCR yet are dropped, the ones in flight are
+                # awaited so their results are stored with the rest
+                for future in futures[consumed:]:
+                    future.cancel()
+                executor.shutdown(wait=True)
+                parsed_batch.extend(
+                    self._parsed_page(book_name, page_num, future.result()[0])
+                    for page_num, future in zip(
+                        page_nums[consumed:], futures[consumed:]
                     )
-                    self.persistence_service.store_parsed_page(parsed_page)
-            else:
-                logger.info(f"Page {page_num} already parsed")
+                    if not future.cancelled()
+                    and future.exception() is None
+                    and not future.result()[0].error
+                    and future.result()[0].extracted_text
+                )
+                raise
+            finally:
+                # pages extracted before a failure are kept, OCR is the expensive part
+                if parsed_batch:
+                    self.persistence_service.store_parsed_pages(parsed_batch)
+
+    @staticmethod
+    def _parsed_page(
+        book_name: str, page_num: int, result: ExtractionResult
+    ) -> ParsedPage:
+        return ParsedPage(
+            book_path=book_name,
+            page_number=page_num,
+            content=result.extracted_text,
+            parsed_at=datetime.now(),
+            extraction_task_id=result.task_id,
+        )
+
+    def _extract_page(
+        self, book_name: str, page_num: int, page: bytes
+    ) -> tuple[ExtractionResult, float]:
+        """Extract text of a single page, returning the result and the time it took in ms"""
+        start_ns = time.perf_counter_ns()
+        result = self.text_extraction_service.extract_text(
+            page, f"{book_name}-page_{page_num + 1}.pdf"
+        )
+        return result, (time.perf_counter_ns() - start_ns) / 1e6
@@ -1,5 +1,5 @@
-import shutil
-from pathlib import Path
+import io
+from typing import Collection
 
 import PyPDF2
 
@@ -9,47 +9,40 @@ class PDFSplitter:
         """Initialize PDFSplitter class"""
         pass
 
-    def split_pdf(self, pdf_path: Path) -> dict[int, str]:
-        # Check if file exists
-        if not pdf_path.exists():
-            raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-
-        # Create output directory
-        output_dir = pdf_path.parent / f"{pdf_path.stem}-pages"
-        if output_dir.exists():
-            shutil.rmtree(output_dir.as_posix())
-
-        output_dir.mkdir(exist_ok=True)
-        created_files = {}
+    def split_pdf(
+        self, pdf_content: bytes, skip_pages: Collection[int] = ()
+    ) -> dict[int, bytes]:
+        """
+        Split the PDF into single-page PDF documents held in memory, except pages in
+        `skip_pages`. Re-encoding a page is the expensive part, so skipped pages are never written.
+        """
+        pages = {}
 
         try:
-            # Open the PDF file
-            with open(pdf_path, "rb") as file:
+            # Read the PDF straight from memory
+            with io.BytesIO(pdf_content) as file:
                 # Create PDF reader object
                 pdf_reader = PyPDF2.PdfReader(file)
 
                 # Iterate through all pages
                 for page_num in range(len(pdf_reader.pages)):
+                    if page_num in skip_pages:
+                        continue
+
                     # Create PDF writer object
                     pdf_writer = PyPDF2.PdfWriter()
 
                     # Add page to writer
                     pdf_writer.add_page(pdf_reader.pages[page_num])
 
-                    # Generate output filename
-                    output_filename = (
-                        output_dir / f"{pdf_path.stem}-page_{page_num + 1}.pdf"
-                    )
-
-                    # Write the page to a new PDF file
-                    with open(output_filename, "wb") as output_file:
-                        pdf_writer.write(output_file)
-
-                    created_files[page_num] = str(output_filename)
+                    # Write the page to an in-memory buffer
+                    buffer = io.BytesIO()
+                    pdf_writer.write(buffer)
+                    pages[page_num] = buffer.getvalue()
 
         except PyPDF2.PdfReadError as e:
             raise PyPDF2.PdfReadError(f"Error reading PDF: {e}")
         except Exception as e:
             raise Exception(f"An error occurred while splitting the PDF: {e}")
 
-        return created_files
+        return pages
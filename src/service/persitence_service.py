@@ -1,13 +1,19 @@
+import atexit
+import queue
 import sqlite3
-import tempfile
+import threading
+import zlib
+from collections import OrderedDict
 from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Iterator, Tuple, Union
 
-from langchain.smith.evaluation.runner_utils import logger
+from loguru import logger
 from pydantic import BaseModel
 
 from src.constants import DATA_DIR
@@ -21,6 +27,28 @@ class TableNames(Enum):
     BOOKS = "books"
 
 
+# timestamps are stored as INTEGER microseconds since the epoch, which are smaller
+# than ISO-8601 text and cheaper to turn back into a datetime
+def _to_epoch_us(dt: datetime) -> int:
+    return round(dt.timestamp() * 1_000_000)
+
+
+def _from_epoch_us(epoch_us: int) -> datetime:
+    return datetime.fromtimestamp(epoch_us / 1_000_000)
+
+
+# parsed page text is stored zlib-compressed, prose shrinks several times over
+def _compress_content(content: str) -> bytes:
+    return zlib.compress(content.encode("utf-8"), 3)
+
+
+def _decompress_content(content: Union[str, bytes]) -> str:
+    # pages stored by older versions are plain text
+    if isinstance(content, str):
+        return content
+    return zlib.decompress(content).decode("utf-8")
+
+
 @dataclass
 class ParsedPage:
     book_path: str
@@ -33,7 +61,7 @@ class ParsedPage:
         return {
             "book_path": self.book_path,
             "page_number": self.page_number,
-            "parsed_at": self.parsed_at,
+            "parsed_at": self.parsed_at.isoformat(),
         }
 
 
@@ -64,23 +92,109 @@ class Book:
     added_at: datetime
     book_content: bytes
 
-    @contextmanager
-    def as_temp_pdf(self):
-        tmp_dir = tempfile.gettempdir()
-        pdf_path = Path(tmp_dir) / f"{self.name}.pdf"
-        with open(pdf_path, "wb") as f:
-            f.write(self.book_content)
-
-        try:
-            yield pdf_path
-        finally:
-            pdf_path.unlink(missing_ok=True)
-
 
 class PersistenceService:
+    _FETCH_SIZE = 256
+    # matches the default concurrency of the parser and deck services
+    _MAX_READERS = 8
+    _BOOK_CACHE_SIZE = 4
+    # SQLITE_MAX_VARIABLE_NUMBER of SQLite builds older than 3.32
+    _MAX_VARIABLES = 999
+    # WAL lets reads run alongside a write. With WAL, synchronous=NORMAL only fsyncs at
+    # checkpoints: a crash can lose the last few commits but never corrupts the database,
+    # which is fine for data that can be re-parsed
+    _PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+    )
+    # set on the writer and on every reader connection
+    _CONNECTION_PRAGMAS = (
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-65536",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA busy_timeout=5000",
+    )
+
+    # queries run per page / per exercise are formatted once, when the class is defined
+    _INSERT_EXERCISE = f"""
+        INSERT INTO {TableNames.EXERCISES.value}
+        (book_path, page_number, title, instructions, extracted_at)
+        VALUES (?, ?, ?, ?, ?)
+    """
+    _INSERT_QUESTIONS = f"""
+        INSERT INTO {TableNames.EXERCISE_QUESTIONS.value}
+        (exercise_id, question, question_order)
+        VALUES """
+    _SELECT_EXERCISES = f"""
+        SELECT e.id, e.book_path, e.page_number, e.title, e.instructions, e.extracted_at,
+               q.question
+        FROM {TableNames.EXERCISES.value} e
+        LEFT JOIN {TableNames.EXERCISE_QUESTIONS.value} q ON q.exercise_id = e.id
+        WHERE e.book_path = ?
+    """
+    _UPSERT_PARSED_PAGE = f"""
+        INSERT INTO {TableNames.PARSED_PAGES.value}
+        (book_path, page_number, content, parsed_at, extraction_task_id)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(book_path, page_number) DO UPDATE SET
+            content = excluded.content,
+            parsed_at = excluded.parsed_at,
+            extraction_task_id = excluded.extraction_task_id
+    """
+    _IS_PAGE_PARSED = f"""
+        SELECT 1 FROM {TableNames.PARSED_PAGES.value}
+        WHERE book_path = ? AND page_number = ?
+        LIMIT 1
+    """
+    _SELECT_PARSED_PAGES = f"""
+        SELECT book_path, page_number, content, parsed_at, extraction_task_id
+        FROM {TableNames.PARSED_PAGES.value}
+        WHERE book_path = ?
+    """
+
     def __init__(self, data_dir: Path = DATA_DIR, db_path: str = "parsed_pages.db"):
         self.db_path = (data_dir / db_path).as_posix()
+        # one connection for the lifetime of the service, shared between threads
+        # under a lock instead of reconnecting (and reparsing the schema) per query
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for pragma in self._PRAGMAS + self._CONNECTION_PRAGMAS:
+            self._conn.execute(pragma)
+        self._lock = threading.RLock()
+        # book reads are served from memory until a book is added or deleted
+        # through this service, which bumps the version
+        self._books_version = 0
+        self._book_names_cache: Optional[Tuple[int, List[str]]] = None
+        self._book_cache: "OrderedDict[str, Tuple[int, Book]]" = OrderedDict()
         self._init_db()
+        # enabled after _init_db, whose migrations rebuild tables that are referenced
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        # with WAL readers don't block each other nor the writer, so reads run on a
+        # pool of read-only connections instead of queueing on the writer's lock.
+        # Readers are opened on demand, at most one per concurrent read
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(self._MAX_READERS)
+        # registered once the service is fully built, so a failing migration
+        # surfaces its own error instead of one from close()
+        atexit.register(self.close)
+
+    def _open_reader(self) -> sqlite3.Connection:
+        reader = sqlite3.connect(
+            f"{Path(self.db_path).resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+        for pragma in self._CONNECTION_PRAGMAS:
+            reader.execute(pragma)
+        return reader
+
+    def close(self) -> None:
+        # closing explicitly must not close the connections again at exit
+        atexit.unregister(self.close)
+        while not self._readers.empty():
+            self._readers.get_nowait().close()
+        # refreshes planner statistics for the indexes, only where they are stale
+        self._conn.execute("PRAGMA optimize")
+        self._conn.close()
 
     def _init_db(self) -> None:
         """Initialize the database and create required tables if they don't exist"""
@@ -89,8 +203,8 @@ class PersistenceService:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 book_path TEXT NOT NULL,
                 page_number INTEGER NOT NULL,
-                content TEXT NOT NULL,
-                parsed_at TIMESTAMP NOT NULL,
+                content BLOB NOT NULL,
+                parsed_at INTEGER NOT NULL,
                 extraction_task_id TEXT,
                 UNIQUE(book_path, page_number)
             )
@@ -103,9 +217,10 @@ class PersistenceService:
                 page_number INTEGER NOT NULL,
                 title TEXT NOT NULL,
                 instructions TEXT NOT NULL,
-                extracted_at TIMESTAMP NOT NULL,
-                FOREIGN KEY(book_path, page_number) 
+                extracted_at INTEGER NOT NULL,
+                FOREIGN KEY(book_path, page_number)
                 REFERENCES {TableNames.PARSED_PAGES.value}(book_path, page_number)
+                ON DELETE CASCADE
             )
         """
 
@@ -116,6 +231,7 @@ class PersistenceService:
                 question TEXT NOT NULL,
                 question_order INTEGER NOT NULL,
                 FOREIGN KEY(exercise_id) REFERENCES {TableNames.EXERCISES.value}(id)
+                ON DELETE CASCADE
             )
         """
 
@@ -123,126 +239,338 @@ class PersistenceService:
             CREATE TABLE IF NOT EXISTS {TableNames.BOOKS.value} (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
-                book_content_base64 TEXT NOT NULL,
-                date_added TIMESTAMP NOT NULL
+                book_content BLOB NOT NULL,
+                date_added INTEGER NOT NULL
             )
         """
 
-        for query in [
-            create_parsed_pages,
-            create_exercises,
-            create_exercise_questions,
-            create_books,
-        ]:
-            self.execute_query(query, ())
+        create_exercises_page_index = f"""
+            CREATE INDEX IF NOT EXISTS idx_exercises_book_page
+            ON {TableNames.EXERCISES.value} (book_path, page_number)
+        """
+
+        create_exercise_questions_index = f"""
+            CREATE INDEX IF NOT EXISTS idx_exercise_questions_exercise
+            ON {TableNames.EXERCISE_QUESTIONS.value} (exercise_id, question_order)
+        """
+
+        create_books_name_index = f"""
+            CREATE INDEX IF NOT EXISTS idx_books_name
+            ON {TableNames.BOOKS.value} (name)
+        """
+
+        # the schema is installed in two transactions, around the migrations which
+        # inspect the existing tables and run in transactions of their own
+        with self._transaction():
+            for query in [
+                create_parsed_pages,
+                create_exercises,
+                create_exercise_questions,
+            ]:
+                self._conn.execute(query)
+        self._migrate_hex_books(create_books)
+        self._migrate_to_cascading_deletes(TableNames.EXERCISES.value, create_exercises)
+        self._migrate_to_cascading_deletes(
+            TableNames.EXERCISE_QUESTIONS.value, create_exercise_questions
+        )
+        with self._transaction():
+            for query in [
+                create_books,
+                create_exercises_page_index,
+                create_exercise_questions_index,
+                create_books_name_index,
+            ]:
+                self._conn.execute(query)
+        self._migrate_iso_timestamps()
+
+    def _migrate_hex_books(self, create_books: str) -> None:
+        """Move books stored by older versions as hex text into a BLOB column"""
+        columns = {
+            row[1]
+            for row in self.execute_query(
+                f"PRAGMA table_info({TableNames.BOOKS.value})", ()
+            )
+        }
+        if "book_content_base64" not in columns:
+            return
+
+        logger.info("Migrating stored books from hex text to BLOB")
+        old_table = f"{TableNames.BOOKS.value}_hex"
+        with self._transaction():
+            self._conn.execute(
+                f"ALTER TABLE {TableNames.BOOKS.value} RENAME TO {old_table}"
+            )
+            self._conn.execute(create_books)
+            self._conn.executemany(
+                f"""
+                INSERT INTO {TableNames.BOOKS.value} (id, name, book_content, date_added)
+                VALUES (?, ?, ?, ?)
+                """,
+                (
+                    (row[0], row[1], bytes.fromhex(row[2]), row[3])
+                    for row in self._conn.execute(
+                        f"SELECT id, name, book_content_base64, date_added FROM {old_table}"
+                    )
+                ),
+            )
+            self._conn.execute(f"DROP TABLE {old_table}")
+
+    def _migrate_iso_timestamps(self) -> None:
+        """Convert ISO-8601 timestamps of older versions to epoch microseconds"""
+        for table, column in (
+            (TableNames.PARSED_PAGES.value, "parsed_at"),
+            (TableNames.EXERCISES.value, "extracted_at"),
+            (TableNames.BOOKS.value, "date_added"),
+        ):
+            select_text = (
+                f"SELECT id, {column} FROM {table} WHERE typeof({column}) = 'text'"
+            )
+            if not self.execute_query(select_text + " LIMIT 1", ()):
+                continue
+
+            logger.info(f"Migrating {table}.{column} to epoch microseconds")
+            with self._transaction():
+                rows = self._conn.execute(select_text).fetchall()
+                self._conn.executemany(
+                    f"UPDATE {table} SET {column} = ? WHERE id = ?",
+                    [
+                        (_to_epoch_us(datetime.fromisoformat(value)), row_id)
+                        for row_id, value in rows
+                    ],
+                )
+
+    def _migrate_to_cascading_deletes(self, table: str, create_table: str) -> None:
+        """Recreate a table created by older versions without ON DELETE CASCADE"""
+        foreign_keys = self.execute_query(f"PRAGMA foreign_key_list({table})", ())
+        if all(fk[6] == "CASCADE" for fk in foreign_keys):
+            return
+
+        logger.info(f"Migrating {table} to cascading deletes")
+        new_table = f"{table}_new"
+        # runs before foreign keys are enabled, so dropping the old table leaves
+        # the rows referencing it untouched
+        with self._transaction():
+            self._conn.execute(
+                create_table.replace(f"EXISTS {table} (", f"EXISTS {new_table} (", 1)
+            )
+            self._conn.execute(f"INSERT INTO {new_table} SELECT * FROM {table}")
+            self._conn.execute(f"DROP TABLE {table}")
+            self._conn.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """
+        Run the enclosed statements as one write transaction. BEGIN IMMEDIATE takes the
+        write lock upfront, and also covers DDL, which never opens a transaction implicitly.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.rollback()
+                raise
+            self._conn.commit()
 
     def execute_query(self, query: str, params: tuple) -> list[tuple]:
-        logger.debug(f"Executing query: {query} with params: {params}")
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            conn.commit()
-            return cursor.fetchall()
+        # loguru formats lazily, so nothing is built unless DEBUG is enabled
+        logger.debug("Executing query: {} with params: {}", query, params)
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            rows = cursor.fetchall()
+            self._conn.commit()
+            return rows
+
+    def _execute_write(self, query: str, params: tuple) -> Optional[int]:
+        """Run a single write statement and return the rowid of the last inserted row"""
+        logger.debug("Executing query: {} with params: {}", query, params)
+        with self._lock:
+            cursor = self._conn.execute(query, params)
+            self._conn.commit()
+            return cursor.lastrowid
+
+    @contextmanager
+    def _read_conn(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection from the pool, blocking while all are in use"""
+        with self._reader_slots:
+            try:
+                reader = self._readers.get_nowait()
+            except queue.Empty:
+                reader = self._open_reader()
+            try:
+                yield reader
+            finally:
+                self._readers.put(reader)
+
+    def _read_query(self, query: str, params: tuple) -> list[tuple]:
+        logger.debug("Executing query: {} with params: {}", query, params)
+        with self._read_conn() as reader:
+            return reader.execute(query, params).fetchall()
+
+    def _iter_query(self, query: str, params: tuple) -> Iterator[tuple]:
+        """Yield rows in batches, holding a pooled reader until the rows are consumed"""
+        logger.debug("Executing query: {} with params: {}", query, params)
+        with self._read_conn() as reader:
+            cursor = reader.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(self._FETCH_SIZE)
+                if not rows:
+                    return
+                yield from rows
 
     def add_book(self, book_path: Path, book_name: str) -> Book:
-        with open(book_path, "rb") as f:
-            book_content = f.read()
-        book_content_base64 = book_content.hex()
+        book_content = book_path.read_bytes()
         book = Book(name=book_name, added_at=datetime.now(), book_content=book_content)
 
         query = f"""
-            INSERT INTO {TableNames.BOOKS.value} (name, book_content_base64, date_added)
+            INSERT INTO {TableNames.BOOKS.value} (name, book_content, date_added)
             VALUES (?, ?, ?)
         """
-        self.execute_query(
-            query, (book_name, book_content_base64, book.added_at.isoformat())
+        self._execute_write(
+            query, (book_name, book_content, _to_epoch_us(book.added_at))
         )
+        self._invalidate_books()
         return book
 
+    def _invalidate_books(self) -> None:
+        with self._lock:
+            self._books_version += 1
+            self._book_names_cache = None
+            self._book_cache.clear()
+
     def get_book(self, book_name: str) -> Optional[Book]:
+        version = self._books_version
+        with self._lock:
+            cached = self._book_cache.get(book_name)
+            if cached is not None and cached[0] == version:
+                self._book_cache.move_to_end(book_name)
+                return cached[1]
+
         query = f"""
-            SELECT name, book_content_base64, date_added
+            SELECT name, book_content, date_added
             FROM {TableNames.BOOKS.value}
             WHERE name = ?
         """
-        rows = self.execute_query(query, (book_name,))
-        if rows:
-            row = rows[0]
-            return Book(
-                name=row[0],
-                added_at=datetime.fromisoformat(row[2]),
-                book_content=bytes.fromhex(row[1]),
-            )
-        return None
+        rows = self._read_query(query, (book_name,))
+        if not rows:
+            return None
+        row = rows[0]
+        book = Book(
+            name=row[0],
+            added_at=_from_epoch_us(row[2]),
+            book_content=row[1],
+        )
+        with self._lock:
+            # a write during the read makes the result stale, so it isn't cached
+            if version == self._books_version:
+                self._book_cache[book_name] = (version, book)
+                if len(self._book_cache) > self._BOOK_CACHE_SIZE:
+                    self._book_cache.popitem(last=False)
+        return book
+
+    def book_exists(self, book_name: str) -> bool:
+        query = f"""
+            SELECT 1 FROM {TableNames.BOOKS.value}
+            WHERE name = ?
+            LIMIT 1
+        """
+        return bool(self._read_query(query, (book_name,)))
 
     def list_book_names(self) -> list[str]:
+        version = self._books_version
+        cached = self._book_names_cache
+        if cached is not None and cached[0] == version:
+            return list(cached[1])
+
+        names = list(self.iter_book_names())
+        with self._lock:
+            if version == self._books_version:
+                self._book_names_cache = (version, names)
+        return list(names)
+
+    def iter_book_names(self) -> Iterator[str]:
+        """Yield book names in alphabetical order"""
         query = f"""
             SELECT name
             FROM {TableNames.BOOKS.value}
+            ORDER BY name
         """
-        rows = self.execute_query(query, ())
-        return [row[0] for row in rows]
+        for row in self._iter_query(query, ()):
+            yield row[0]
 
     def store_exercise(self, exercise: StoredExercise) -> int:
         """Store an exercise and its questions in the database"""
-        insert_exercise = f"""
-            INSERT INTO {TableNames.EXERCISES.value}
-            (book_path, page_number, title, instructions, extracted_at)
-            VALUES (?, ?, ?, ?, ?)
-        """
-        rows = self.execute_query(
-            insert_exercise,
-            (
-                exercise.book_path,
-                exercise.page_number,
-                exercise.title,
-                exercise.instructions,
-                exercise.extracted_at.isoformat(),
-            ),
+        logger.debug(
+            "Executing query: {} with params: {}", self._INSERT_EXERCISE, exercise
         )
-        exercise_id = rows[0][0] if rows else None
-
-        if exercise_id is not None:
-            insert_question = f"""
-                INSERT INTO {TableNames.EXERCISE_QUESTIONS.value}
-                (exercise_id, question, question_order)
-                VALUES (?, ?, ?)
-            """
-            for i, question in enumerate(exercise.questions):
-                self.execute_query(insert_question, (exercise_id, question, i))
-
-        if exercise_id is None:
-            raise LanguageLearningMethodException(
-                "Error storing exercise - no exercise ID"
+        # the exercise and all of its questions are written in one transaction
+        with self._transaction():
+            cursor = self._conn.execute(
+                self._INSERT_EXERCISE,
+                (
+                    exercise.book_path,
+                    exercise.page_number,
+                    exercise.title,
+                    exercise.instructions,
+                    _to_epoch_us(exercise.extracted_at),
+                ),
+            )
+            exercise_id = cursor.lastrowid
+            if exercise_id is None:
+                raise LanguageLearningMethodException(
+                    "Error storing exercise - no exercise ID"
+                )
+            self._insert_rows(
+                self._INSERT_QUESTIONS,
+                [
+                    (exercise_id, question, i)
+                    for i, question in enumerate(exercise.questions)
+                ],
             )
         return exercise_id
 
+    def _insert_rows(self, insert_prefix: str, rows: List[tuple]) -> None:
+        """
+        Insert rows with multi-row VALUES statements, one statement execution per chunk
+        instead of executemany's one per row. Has to run inside a transaction.
+        """
+        if not rows:
+            return
+        placeholders = "(" + ", ".join("?" * len(rows[0])) + ")"
+        chunk_size = self._MAX_VARIABLES // len(rows[0])
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start : start + chunk_size]
+            self._conn.execute(
+                insert_prefix + ", ".join([placeholders] * len(chunk)),
+                [value for row in chunk for value in row],
+            )
+
     def get_exercises(
-        self, book_path: str, page_number: Optional[int] = None
+        self,
+        book_path: str,
+        page_number: Optional[int] = None,
+        start_page: Optional[int] = None,
+        end_page: Optional[int] = None,
     ) -> List[StoredExercise]:
-        base_query = f"""
-            SELECT e.id, e.book_path, e.page_number, e.title, e.instructions, e.extracted_at
-            FROM {TableNames.EXERCISES.value} e
-            WHERE e.book_path = ?
-        """
+        """Get exercises of a book ordered by page number, optionally for one page or a page range"""
+        base_query = self._SELECT_EXERCISES
         params = [book_path]
 
         if page_number is not None:
             base_query += " AND e.page_number = ?"
             params.append(page_number)
+        if start_page is not None and end_page is not None:
+            base_query += " AND e.page_number BETWEEN ? AND ?"
+            params.extend([start_page, end_page])
+        base_query += " ORDER BY e.page_number, e.id, q.question_order"
 
-        exercise_rows = self.execute_query(base_query, tuple(params))
+        rows = self._read_query(base_query, tuple(params))
         exercises = []
 
-        for row in exercise_rows:
-            question_query = f"""
-                SELECT question FROM {TableNames.EXERCISE_QUESTIONS.value}
-                WHERE exercise_id = ?
-                ORDER BY question_order
-            """
-            question_rows = self.execute_query(question_query, (row[0],))
-            questions = [q[0] for q in question_rows]
-
+        # one row per question, rows of an exercise are consecutive
+        for _, exercise_rows in groupby(rows, key=itemgetter(0)):
+            exercise_rows = list(exercise_rows)
+            row = exercise_rows[0]
             exercises.append(
                 StoredExercise(
                     id=row[0],
@@ -250,8 +578,8 @@ class PersistenceService:
                     page_number=row[2],
                     title=row[3],
                     instructions=row[4],
-                    questions=questions,
-                    extracted_at=datetime.fromisoformat(row[5]),
+                    questions=[r[6] for r in exercise_rows if r[6] is not None],
+                    extracted_at=_from_epoch_us(row[5]),
                 )
             )
 
@@ -259,79 +587,130 @@ class PersistenceService:
 
     def store_parsed_page(self, parsed_page: ParsedPage) -> bool:
         try:
-            query = f"""
-                INSERT OR REPLACE INTO {TableNames.PARSED_PAGES.value}
-                (book_path, page_number, content, parsed_at, extraction_task_id)
-                VALUES (?, ?, ?, ?, ?)
-            """
-            self.execute_query(
-                query,
-                (
-                    str(parsed_page.book_path),
-                    parsed_page.page_number,
-                    parsed_page.content,
-                    parsed_page.parsed_at.isoformat(),
-                    parsed_page.extraction_task_id,
-                ),
-            )
+            self.store_parsed_pages([parsed_page])
             return True
         except sqlite3.Error:
             return False
 
-    def is_page_parsed(self, book_name: str, page_number: int) -> bool:
-        query = f"""
-            SELECT COUNT(*) FROM {TableNames.PARSED_PAGES.value}
-            WHERE book_path = ? AND page_number = ?
+    def store_parsed_pages(self, parsed_pages: List[ParsedPage]) -> None:
         """
-        rows = self.execute_query(query, (str(book_name), page_number))
-        return rows[0][0] > 0
+        Store many parsed pages in a single transaction. Re-parsed pages are updated in
+        place, a REPLACE would delete the row and cascade to the page's exercises.
+        """
+        logger.debug(
+            "Executing query: {} for {} pages",
+            self._UPSERT_PARSED_PAGE,
+            len(parsed_pages),
+        )
+        with self._transaction():
+            self._conn.executemany(
+                self._UPSERT_PARSED_PAGE,
+                [
+                    (
+                        str(parsed_page.book_path),
+                        parsed_page.page_number,
+                        _compress_content(parsed_page.content),
+                        _to_epoch_us(parsed_page.parsed_at),
+                        parsed_page.extraction_task_id,
+                    )
+                    for parsed_page in parsed_pages
+                ],
+            )
+
+    def is_page_parsed(self, book_name: str, page_number: int) -> bool:
+        return bool(
+            self._read_query(self._IS_PAGE_PARSED, (str(book_name), page_number))
+        )
 
     def get_parsed_page(self, book_name: str, page_number: int) -> Optional[ParsedPage]:
-        query = f"""
-            SELECT book_path, page_number, content, parsed_at, extraction_task_id
-            FROM {TableNames.PARSED_PAGES.value}
-            WHERE book_path = ? AND page_number = ?
-        """
-        rows = self.execute_query(query, (str(book_name), page_number))
+        query = self._SELECT_PARSED_PAGES + " AND page_number = ?"
+        rows = self._read_query(query, (str(book_name), page_number))
 
         if rows:
             row = rows[0]
             return ParsedPage(
                 book_path=row[0],
                 page_number=row[1],
-                content=row[2],
-                parsed_at=datetime.fromisoformat(row[3]),
+                content=_decompress_content(row[2]),
+                parsed_at=_from_epoch_us(row[3]),
                 extraction_task_id=row[4],
             )
         return None
 
-    def get_all_parsed_pages(self, book_name: str) -> List[ParsedPage]:
-        query = f"""
-            SELECT book_path, page_number, content, parsed_at, extraction_task_id
-            FROM {TableNames.PARSED_PAGES.value}
-            WHERE book_path = ?
-            ORDER BY page_number
-        """
-        rows = self.execute_query(query, (str(book_name),))
+    def get_parsed_pages(
+        self, book_name: str, start_page: int, end_page: int
+    ) -> dict[int, ParsedPage]:
+        """Get parsed pages of a book with page numbers in [start_page, end_page], keyed by page number"""
+        query = (
+            self._SELECT_PARSED_PAGES
+            + " AND page_number BETWEEN ? AND ? ORDER BY page_number"
+        )
+        rows = self._read_query(query, (str(book_name), start_page, end_page))
 
-        return [
-            ParsedPage(
+        return {
+            row[1]: ParsedPage(
                 book_path=row[0],
                 page_number=row[1],
-                content=row[2],
-                parsed_at=datetime.fromisoformat(row[3]),
+                content=_decompress_content(row[2]),
+                parsed_at=_from_epoch_us(row[3]),
                 extraction_task_id=row[4],
             )
             for row in rows
-        ]
+        }
+
+    def get_all_parsed_pages(self, book_name: str) -> List[ParsedPage]:
+        return list(self.iter_parsed_pages(book_name))
+
+    def iter_parsed_pages(
+        self, book_name: str, offset: int = 0, limit: int = -1
+    ) -> Iterator[ParsedPage]:
+        """Yield parsed pages of a book ordered by page number, one row at a time"""
+        query = self._SELECT_PARSED_PAGES + " ORDER BY page_number LIMIT ? OFFSET ?"
+        params = (str(book_name), limit, offset)
+        for row in self._iter_query(query, params):
+            yield ParsedPage(
+                book_path=row[0],
+                page_number=row[1],
+                content=_decompress_content(row[2]),
+                parsed_at=_from_epoch_us(row[3]),
+                extraction_task_id=row[4],
+            )
+
+    def count_parsed_pages(self, book_name: str) -> int:
+        query = f"""
+            SELECT COUNT(*) FROM {TableNames.PARSED_PAGES.value}
+            WHERE book_path = ?
+        """
+        rows = self._read_query(query, (str(book_name),))
+        return rows[0][0]
+
+    def count_exercises(self, book_name: str) -> int:
+        query = f"""
+            SELECT COUNT(*) FROM {TableNames.EXERCISES.value}
+            WHERE book_path = ?
+        """
+        rows = self._read_query(query, (str(book_name),))
+        return rows[0][0]
+
+    def get_parsed_page_numbers(self, book_name: str) -> set[int]:
+        query = f"""
+            SELECT page_number FROM {TableNames.PARSED_PAGES.value}
+            WHERE book_path = ?
+        """
+        rows = self._read_query(query, (str(book_name),))
+        return {row[0] for row in rows}
 
     def clear_book_pages(self, book_name: str) -> bool:
+        """
+        Delete all parsed pages of a book. The exercises extracted from them, with
+        their questions, are deleted too, through ON DELETE CASCADE.
+        """
         try:
             query = f"""
                 DELETE FROM {TableNames.PARSED_PAGES.value}
                 WHERE book_path = ?
             """
-            self.execute_query(query, (str(book_name),))
+            self._execute_write(query, (str(book_name),))
             return True
         except sqlite3.Error:
             return False
@@ -345,5 +724,8 @@ class PersistenceService:
             DELETE FROM {TableNames.PARSED_PAGES.value}
             WHERE book_path = ?
         """
-        self.execute_query(delete_book, (book_name,))
-        self.execute_query(delete_pages, (book_name,))
+        # exercises and their questions go with the pages through ON DELETE CASCADE
+        with self._transaction():
+            self._conn.execute(delete_book, (book_name,))
+            self._conn.execute(delete_pages, (book_name,))
+        self._invalidate_books()
@@ -1,23 +1,31 @@
 import base64
 import time
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, Optional
 
 import requests
 from loguru import logger
+from requests.adapters import HTTPAdapter
 
 
 @dataclass
 class ExtractionResult:
     """Data class to store extraction results"""
 
-    file_path: str
+    file_name: str
     extracted_text: Optional[str]
     error: Optional[str] = None
     task_id: Optional[str] = None
 
 
+@lru_cache(maxsize=8)
+def _read_prompt_file(prompt_file: str, mtime_ns: int) -> str:
+    """Prompt file contents, re-read only when the file is modified"""
+    return Path(prompt_file).read_text()
+
+
 class TextExtractionService:
     _PROMPT = """
     Usted es un especialista en el aprendizaje de idiomas encargado de extraer y analizar el contenido de la página de un libro de texto. Analice el contenido proporcionado prestando especial atención a los siguientes aspectos:
@@ -84,6 +92,13 @@ Recuerde que este contenido se utilizará para el aprendizaje de idiomas, por lo
 Formatea la respuesta en markdown o texto sin formato. No escriba nada más
 """
 
+    # result polling starts fast for short tasks and backs off for long OCR runs
+    _POLL_INITIAL_DELAY = 0.25
+    _POLL_MAX_DELAY = 5.0
+    # statuses of servers without the upload endpoint, only those fall back to the
+    # base64 request, which holds a third larger copy of the file in memory
+    _UPLOAD_UNSUPPORTED_STATUSES = (404, 405)
+
     def __init__(
         self,
         base_url: str = "http://localhost:8000",
@@ -113,22 +128,36 @@ Formatea la respuesta en markdown o texto sin formato. No escriba nada más
         self.request_url = f"{self.base_url}/ocr/request"
         self.result_url = f"{self.base_url}/ocr/result"
 
+        # keeps connections to the OCR service alive between uploads and polls,
+        # pages are extracted from several threads so the pool is sized for them
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
     def extract_text(
         self,
-        file_path: str,
+        file_content: bytes,
+        file_name: str,
         prompt: Optional[str] = None,
         prompt_file: Optional[str] = None,
         storage_filename: Optional[str] = None,
         print_progress: bool = False,
     ) -> ExtractionResult:
-        logger.debug(f"Extracting text from file {file_path}")
+        logger.debug(f"Extracting text from file {file_name}")
         return self._process_single_file(
-            file_path, prompt, prompt_file, storage_filename, print_progress
+            file_content,
+            file_name,
+            prompt,
+            prompt_file,
+            storage_filename,
+            print_progress,
         )
 
     def _process_single_file(
         self,
-        file_path: str,
+        file_content: bytes,
+        file_name: str,
         prompt: Optional[str],
         prompt_file: Optional[str],
         storage_filename: Optional[str],
@@ -138,98 +167,106 @@ Formatea la respuesta en markdown o texto sin formato. No escriba nada más
         # Read prompt file if provided
         if prompt_file:
             try:
-                prompt = Path(prompt_file).read_text()
+                prompt = _read_prompt_file(
+                    prompt_file, Path(prompt_file).stat().st_mtime_ns
+                )
             except FileNotFoundError:
                 logger.error(f"Prompt file not found: {prompt_file}")
                 return ExtractionResult(
-                    file_path=file_path,
+                    file_name=file_name,
                     extracted_text=None,
                     error=f"Prompt file not found: {prompt_file}",
                 )
 
         # Try file upload first
-        result = self._upload_file(file_path, prompt, storage_filename)
-
-        # If upload fails, try request method
-        if result is None:
-            result = self._request_file(file_path, prompt, storage_filename)
+        response = self._upload_file(file_content, file_name, prompt, storage_filename)
+        if response.status_code == 200:
+            result = response.json()
+        elif response.status_code in self._UPLOAD_UNSUPPORTED_STATUSES:
+            result = self._request_file(file_content, prompt, storage_filename)
+        else:
+            logger.error(
+                f"Upload of {file_name} failed with status {response.status_code}"
+            )
+            result = None
 
-        # If both methods fail, return error
+        # If the file could not be submitted, return error
         if result is None:
             return ExtractionResult(
-                file_path=file_path,
+                file_name=file_name,
                 extracted_text=None,
-                error="Failed to process file using both upload and request methods",
+                error="Failed to submit file to the OCR service",
             )
 
         # If we got direct text response
         if result.get("text"):
-            return ExtractionResult(file_path=file_path, extracted_text=result["text"])
+            return ExtractionResult(file_name=file_name, extracted_text=result["text"])
 
         # If we got a task ID, wait for the result
         task_id = result.get("task_id")
         if task_id:
             text_result = self._get_result(task_id, print_progress)
             return ExtractionResult(
-                file_path=file_path, extracted_text=text_result, task_id=task_id
+                file_name=file_name, extracted_text=text_result, task_id=task_id
             )
 
         raise ValueError("Invalid response from OCR service")
 
     def _upload_file(
-        self, file_path: str, prompt: Optional[str], storage_filename: Optional[str]
-    ) -> Optional[Dict]:
+        self,
+        file_content: bytes,
+        file_name: str,
+        prompt: Optional[str],
+        storage_filename: Optional[str],
+    ) -> requests.Response:
         """Upload file using multipart form data"""
-        with open(file_path, "rb") as f:
-            files = {"file": f}
-            data = {
-                "ocr_cache": self.ocr_cache,
-                "model": self.model,
-                "strategy": self.strategy,
-                "storage_profile": self.storage_profile,
-            }
-
-            if storage_filename:
-                data["storage_filename"] = storage_filename
-            if prompt:
-                data["prompt"] = self._PROMPT
-
-            response = requests.post(self.upload_url, files=files, data=data)
-            if response.status_code == 200:
-                return response.json()
-            return None
+        files = {"file": (file_name, file_content, "application/pdf")}
+        data = {
+            "ocr_cache": self.ocr_cache,
+            "model": self.model,
+            "strategy": self.strategy,
+            "storage_profile": self.storage_profile,
+        }
+
+        if storage_filename:
+            data["storage_filename"] = storage_filename
+        if prompt:
+            data["prompt"] = prompt
+
+        return self._session.post(self.upload_url, files=files, data=data)
 
     def _request_file(
-        self, file_path: str, prompt: Optional[str], storage_filename: Optional[str]
+        self,
+        file_content: bytes,
+        prompt: Optional[str],
+        storage_filename: Optional[str],
     ) -> Optional[Dict]:
         """Upload file using base64 encoded request"""
-        with open(file_path, "rb") as f:
-            file_content = base64.b64encode(f.read()).decode("utf-8")
-
-            data = {
-                "ocr_cache": self.ocr_cache,
-                "model": self.model,
-                "strategy": self.strategy,
-                "storage_profile": self.storage_profile,
-                "file": file_content,
-            }
-
-            if storage_filename:
-                data["storage_filename"] = storage_filename
-            if prompt:
-                data["prompt"] = self._PROMPT
-
-            response = requests.post(self.request_url, json=data)
-            if response.status_code == 200:
-                return response.json()
-            return None
+        data = {
+            "ocr_cache": self.ocr_cache,
+            "model": self.model,
+            "strategy": self.strategy,
+            "storage_profile": self.storage_profile,
+            "file": base64.b64encode(file_content).decode("ascii"),
+        }
+
+        if storage_filename:
+            data["storage_filename"] = storage_filename
+        if prompt:
+            data["prompt"] = prompt
+
+        response = self._session.post(self.request_url, json=data)
+        if response.status_code == 200:
+            return response.json()
+        return None
 
     def _get_result(self, task_id: str, print_progress: bool) -> Optional[str]:
         """Get result for a given task ID"""
         extracted_text_printed = False
+        delay = self._POLL_INITIAL_DELAY
 
         while True:
-            response = requests.get(f"{self.result_url}/{task_id}")
+            response = self._session.get(f"{self.result_url}/{task_id}")
             if response.status_code != 200:
                 return None
 
@@ -247,4 +284,5 @@ Formatea la respuesta en markdown o texto sin formato. No escriba nada más
                 logger.error(f"Extraction failed: {result['info']}")
                 return None
 
-            time.sleep(1)
+            time.sleep(delay)
+            delay = min(delay * 2, self._POLL_MAX_DELAY)
@@ -1,64 +1,120 @@
+from __future__ import annotations
+
 from dataclasses import dataclass
-from functools import cache
+from functools import cached_property
 from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+from src.error import LanguageLearningMethodException
 
-from src.service.deck_from_prompt_service import DeckFromPromptService
-from src.service.deck_service import DeckService
-from src.service.exercise_builder_service import ExerciseBuilderService
-from src.service.exercise_extraction_service import ExerciseExtractionService
-from src.service.llm_service import LLMService, LLMConfig
-from src.service.pdf_parser import PDFParser
-from src.service.pdf_splitter import PDFSplitter
-from src.service.persitence_service import PersistenceService
+if TYPE_CHECKING:
+    from src.service.deck_from_prompt_service import DeckFromPromptService
+    from src.service.deck_service import DeckService
+    from src.service.exercise_builder_service import ExerciseBuilderService
+    from src.service.exercise_extraction_service import ExerciseExtractionService
+    from src.service.llm_batch_service import OpenAIBatchService
+    from src.service.llm_cache import LLMResponseCache
+    from src.service.llm_service import LLMService, LLMConfig
+    from src.service.pdf_parser import PDFParser
+    from src.service.pdf_splitter import PDFSplitter
+    from src.service.persitence_service import PersistenceService
 
 
 @dataclass
 class ServiceFactoryConfig:
-    llm_config: LLMConfig
     data_dir: Path
+    llm_config: Optional[LLMConfig] = None
 
 
 class ServiceFactory:
+    """
+    Builds services on first request. Each service module is imported inside its
+    accessor, so a command only pays for the services it actually uses.
+    """
+
     def __init__(self, settings: ServiceFactoryConfig) -> None:
         self.settings = settings
 
-    @cache
+    @cached_property
     def exercise_builder_service(self) -> ExerciseBuilderService:
+        from src.service.exercise_builder_service import ExerciseBuilderService
+
         return ExerciseBuilderService(data_dir=self.settings.data_dir)
 
-    @cache
+    @cached_property
     def llm_service(self) -> LLMService:
-        return LLMService(self.settings.llm_config)
+        from src.service.llm_service import LLMService
 
-    @cache
+        if self.settings.llm_config is None:
+            raise LanguageLearningMethodException(
+                "This service factory was created without an LLM config"
+            )
+        return LLMService(
+            self.settings.llm_config, response_cache=self.llm_response_cache
+        )
+
+    @cached_property
+    def llm_response_cache(self) -> LLMResponseCache:
+        from src.service.llm_cache import LLMResponseCache
+
+        return LLMResponseCache(data_dir=self.settings.data_dir)
+
+    @cached_property
     def persistence_service(self) -> PersistenceService:
+        from src.service.persitence_service import PersistenceService
+
         return PersistenceService(data_dir=self.settings.data_dir)
 
-    @cache
+    @cached_property
     def exercise_extractor_service(self) -> ExerciseExtractionService:
+        from src.service.exercise_extraction_service import ExerciseExtractionService
+
         return ExerciseExtractionService(
             data_dir=self.settings.data_dir,
-            persistence_service=self.persistence_service(),
-            llm_service=self.llm_service(),
+            persistence_service=self.persistence_service,
+            llm_service=self.llm_service,
         )
 
-    @cache
+    @cached_property
     def pdf_parser(self) -> PDFParser:
-        return PDFParser(data_dir=self.settings.data_dir)
+        from src.service.pdf_parser import PDFParser
 
-    @cache
+        return PDFParser(
+            persistence_service=self.persistence_service,
+            pdf_splitter=self.pdf_splitter,
+            data_dir=self.settings.data_dir,
+        )
+
+    @cached_property
     def pdf_splitter(self) -> PDFSplitter:
+        from src.service.pdf_splitter import PDFSplitter
+
         return PDFSplitter()
 
-    @cache
+    @cached_property
     def deck_service(self) -> DeckService:
+        from src.service.deck_service import DeckService
+
         return DeckService(
-            llm_service=self.llm_service(),
-            persistence_service=self.persistence_service(),
+            llm_service=self.llm_service,
+            persistence_service=self.persistence_service,
+            batch_service=self.llm_batch_service,
         )
 
-    @cache
+    @cached_property
+    def llm_batch_service(self) -> OpenAIBatchService:
+        from src.service.llm_batch_service import OpenAIBatchService
+
+        if self.settings.llm_config is None:
+            raise LanguageLearningMethodException(
+                "This service factory was created without an LLM config"
+            )
+        return OpenAIBatchService(self.settings.llm_config)
+
+    @cached_property
     def deck_from_prompt_service(self) -> DeckFromPromptService:
+        from src.service.deck_from_prompt_service import DeckFromPromptService
+
         return DeckFromPromptService(
-            llm_service=self.llm_service(),
+            llm_service=self.llm_service,
         )
@@ -4,7 +4,7 @@ from typing import Literal
 from pydantic_settings import BaseSettings
 
 from src.constants import DATA_DIR
-from src.service.llm_service import LLMConfig
+from src.model import LLMConfig
 
 
 class LanguageLearningMethodSettings(BaseSettings):